@@ -1,16 +1,91 @@
+import threading
+import time
 import numpy as np
 
+from AI.transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from AI.move_ordering import ordered_moves, record_cutoff
+from AI.endgame import is_endgame, solve_endgame
+
+COEFF_1 = 1
+COEFF_2 = .2
+
+# Greater than any distance on the board, for the groups too small to take a human group
+FAR = np.iinfo(np.int64).max
+
+
+def _positions_array(positions):
+    return np.array(list(positions),dtype=np.int64).reshape(-1,2)
+
+
+def _distance_terms(humans,n_humans,groups,n_units):
+    """n_human/distance to the closest group big enough to take each human group, 0 without such a group.
+
+    The arrays have a leading batch dimension, humans and groups are (batch,h,2) and (batch,g,2) coordinates,
+    the padding groups have -1 units and the padding humans FAR humans.
+    """
+    dists = np.abs(humans[:,:,None,:]-groups[:,None,:,:]).max(axis=3)
+    dists = np.where(n_units[:,None,:] >= n_humans[:,:,None],dists,FAR).min(axis=2,initial=FAR)
+    reachable = dists < FAR
+    return np.divide(n_humans,dists,out=np.zeros(dists.shape),where=reachable)
+
+
+def _sum_in_order(team_terms,enemy_terms):
+    """Sum of the terms of each state, added one by one in the order of the loop of distance_to_humans"""
+    terms = np.stack([team_terms,enemy_terms],axis=2).reshape(len(team_terms),-1)
+    if terms.shape[1] == 0:
+        return np.zeros(len(terms))
+    return np.add.accumulate(terms,axis=1)[:,-1]
+
+
+def _pad(arrays,value):
+    size = max(len(array) for array in arrays)
+    padded = np.full((len(arrays),size,*arrays[0].shape[1:]),value,dtype=np.int64)
+    for index,array in enumerate(arrays):
+        padded[index,:len(array)] = array
+    return padded
+
+
+def _groups(game_state,positions,team):
+    groups = _positions_array(positions)
+    return groups,game_state.get_units_array(groups,team)
+
+
+def _distances_to_humans(game_states):
+    """distance_to_humans of several states at once, the groups of all the states being padded to the same number"""
+    humans = [_positions_array(game_state.HUMAN_POSITIONS) for game_state in game_states]
+    n_humans = [game_state.get_units_array(h,0) for game_state,h in zip(game_states,humans)]
+    teams = [_groups(game_state,game_state.TEAM_POSITIONS,game_state.TEAM) for game_state in game_states]
+    enemies = [_groups(game_state,game_state.ENEMY_POSITIONS,game_state.ENEMY_TEAM) for game_state in game_states]
+    humans,n_humans = _pad(humans,0),_pad(n_humans,FAR)
+    team_terms = _distance_terms(humans,n_humans,_pad([g for g,_ in teams],0),_pad([n for _,n in teams],-1))
+    enemy_terms = _distance_terms(humans,n_humans,_pad([g for g,_ in enemies],0),_pad([n for _,n in enemies],-1))
+    return _sum_in_order(team_terms,enemy_terms)
+
+
+# Below this number of (human group, group) pairs the loop is faster than the NumPy version
+VECTORIZE_MIN_PAIRS = 32
+
+
 def distance_to_humans(game_state):
+    n_groups = len(game_state.TEAM_POSITIONS) + len(game_state.ENEMY_POSITIONS)
+    if len(game_state.HUMAN_POSITIONS)*n_groups >= VECTORIZE_MIN_PAIRS:
+        humans = _positions_array(game_state.HUMAN_POSITIONS)
+        n_humans = game_state.get_units_array(humans,0)
+        team_groups,team_units = _groups(game_state,game_state.TEAM_POSITIONS,game_state.TEAM)
+        enemy_groups,enemy_units = _groups(game_state,game_state.ENEMY_POSITIONS,game_state.ENEMY_TEAM)
+        team_terms = _distance_terms(humans[None],n_humans[None],team_groups[None],team_units[None])
+        enemy_terms = _distance_terms(humans[None],n_humans[None],enemy_groups[None],enemy_units[None])
+        return _sum_in_order(team_terms,enemy_terms)[0]
     total_score = 0
     for (i,j) in game_state.HUMAN_POSITIONS:
-        n_human = game_state.STATE[i,j,0]
+        n_human = game_state.get_units(i,j,0)
         team_dists = []
         enemy_dists = []
         for i2,j2 in game_state.TEAM_POSITIONS:
-            if game_state.STATE[i2,j2,game_state.TEAM] >= n_human:
+            if game_state.get_units(i2,j2,game_state.TEAM) >= n_human:
                 team_dists.append(max(np.abs(i2-i),np.abs(j2-j)))
         for i2,j2 in game_state.ENEMY_POSITIONS:
-            if game_state.STATE[i2,j2,game_state.ENEMY_TEAM] >= n_human:
+            if game_state.get_units(i2,j2,game_state.ENEMY_TEAM) >= n_human:
                 enemy_dists.append(max(np.abs(i2-i),np.abs(j2-j)))
         if len(team_dists) > 0:
             total_score += n_human/min(team_dists)
@@ -19,52 +94,269 @@ def distance_to_humans(game_state):
     return total_score
 
 
-
-
 def heuristic(game_state):
     is_won = len(game_state.ENEMY_POSITIONS) == 0
-    if is_won: return 100
     is_lost = len(game_state.TEAM_POSITIONS) == 0
-    if is_lost: return 0
-    COEFF_1 = 1
-    COEFF_2 = .2
-    units_diff = np.sum(game_state.STATE[:,:,game_state.TEAM]) - np.sum(game_state.STATE[:,:,game_state.ENEMY_TEAM])
+    if is_won and is_lost: return 0
+    if is_won: return 100
+    if is_lost: return -100
+    units_diff = game_state.UNITS[game_state.TEAM] - game_state.UNITS[game_state.ENEMY_TEAM]
     heuristic_value = COEFF_1*units_diff + COEFF_2*distance_to_humans(game_state)
     return 100*np.tanh(heuristic_value/20)
 
+
+def evaluate_many(game_states):
+    """heuristic of several states in one vectorized call, like the children of a node"""
+    scores = np.zeros(len(game_states))
+    playing = []
+    for index,game_state in enumerate(game_states):
+        if len(game_state.ENEMY_POSITIONS) == 0:
+            scores[index] = 100 if game_state.TEAM_POSITIONS else 0
+        elif len(game_state.TEAM_POSITIONS) == 0:
+            scores[index] = -100
+        else:
+            playing.append(index)
+    if not playing:
+        return scores
+    states = [game_states[index] for index in playing]
+    units_diff = np.array([game_state.UNITS[game_state.TEAM] - game_state.UNITS[game_state.ENEMY_TEAM] for game_state in states])
+    heuristic_values = COEFF_1*units_diff + COEFF_2*_distances_to_humans(states)
+    scores[playing] = 100*np.tanh(heuristic_values/20)
+    return scores
+
 REC_DEPTH = 4
+MAX_DEPTH = 20
+GAMMA = 0.999999
+
+# Kept for the whole game so that the searches of the previous turns are reused
+TRANSPOSITION_TABLE = TranspositionTable()
+
+# Solve the positions with few groups and no humans instead of evaluating them with the heuristic
+ENDGAME_SOLVER = True
+
+# Order the moves with the capture, killer and history heuristics, otherwise only the best move of the transposition table is moved first
+MOVE_ORDERING = True
+
+# Bounds of the scores returned by heuristic and alpha_beta, those of a lost and a won game like in solve_endgame
+MIN_SCORE = -100
+MAX_SCORE = 100
+
+# Only the most probable outcomes of a chance node adding up to this probability are searched
+CHANCE_PROBABILITY_MASS = 0.8
 
-def alpha_beta(game_state,rec_depth=REC_DEPTH,alpha=-100,beta=100):
+# Prune chance nodes with the Star1 and Star2 bounds, otherwise all the outcomes are searched with the full window
+CHANCE_PRUNING = True
+
+# The Star2 probes are only searched when beta is below this score
+STAR2_MAX_BETA = MAX_SCORE
+
+# Beta cuts, and those happening on the first move searched
+CUTOFF_STATS = {"cutoffs": 0, "first_move_cutoffs": 0}
+
+
+# Set to abort the running search, like the pondering when the opponent has played
+STOP_SEARCH = threading.Event()
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def check_deadline(deadline):
+    if (deadline is not None and time.time() > deadline) or STOP_SEARCH.is_set():
+        raise SearchTimeout()
+
+
+def alpha_beta(game_state,rec_depth=REC_DEPTH,alpha=-100,beta=100,deadline=None,is_root=True):
     is_won = len(game_state.ENEMY_POSITIONS) == 0
     is_lost = len(game_state.TEAM_POSITIONS) == 0
-    if rec_depth == 0 or is_won or is_lost:
+    if is_won or is_lost:
         return heuristic(game_state),None
-    GAMMA =0.999999
-    possible_moves = game_state.get_next_moves(rec_depth==REC_DEPTH)
+    if ENDGAME_SOLVER and is_endgame(game_state):
+        solved = solve_endgame(game_state,GAMMA,lambda:check_deadline(deadline))
+        if solved is not None:
+            return solved
+    if rec_depth == 0:
+        return heuristic(game_state),None
+    check_deadline(deadline)
+    alpha_orig = alpha
+    entry = TRANSPOSITION_TABLE.lookup(game_state.HASH)
+    if entry is not None and entry.depth >= rec_depth and not is_root:
+        if entry.flag == EXACT:
+            return min(max(entry.score,alpha),beta),entry.move
+        if entry.flag == LOWER_BOUND and entry.score >= beta:
+            return beta,entry.move
+        if entry.flag == UPPER_BOUND and entry.score <= alpha:
+            return alpha,None
+    best_move = entry.move if entry is not None else None
+    possible_moves = ordered_moves(game_state,rec_depth,is_root,best_move,MOVE_ORDERING)
     max_move = None
-    for move in possible_moves:
-        game_states = game_state.apply_move(move)
-        if len(game_states) > 1:
-            score,_ = alpha_beta_proba(game_states,rec_depth,-beta,-alpha)
-            score = -GAMMA*score
-        else: 
-            score,_ = alpha_beta(game_states[0][1],rec_depth-1,-beta,-alpha)
-            score = -GAMMA*score
+    for index,move in enumerate(possible_moves):
+        score = search_move(game_state,move,rec_depth,alpha,beta,deadline)
         if score >= beta: #Beta cut
+            CUTOFF_STATS["cutoffs"] += 1
+            if index == 0:
+                CUTOFF_STATS["first_move_cutoffs"] += 1
+            if MOVE_ORDERING:
+                record_cutoff(game_state,move,rec_depth)
+            TRANSPOSITION_TABLE.store(game_state.HASH,rec_depth,LOWER_BOUND,beta,move)
             return beta,move
         if score > alpha:
             alpha,max_move = score,move
+    flag = EXACT if alpha > alpha_orig else UPPER_BOUND
+    TRANSPOSITION_TABLE.store(game_state.HASH,rec_depth,flag,alpha,max_move)
     return alpha,max_move
 
 
-def alpha_beta_proba(game_states,rec_depth,alpha,beta):
+def search_move(game_state,move,rec_depth,alpha,beta,deadline=None):
+    """Score of playing move from game_state, for the player making the move"""
+    outcomes = game_state.get_move_outcomes(move)
+    if len(outcomes) > 1:
+        score,_ = alpha_beta_proba(game_state,outcomes,rec_depth,-beta,-alpha,deadline)
+    else: 
+        undo_log = game_state.do_move(outcomes[0][1])
+        try:
+            score,_ = alpha_beta(game_state,rec_depth-1,-beta,-alpha,deadline,False)
+        finally:
+            game_state.undo_move(undo_log)
+    return -GAMMA*score
+
+
+def probable_outcomes(outcomes):
+    """Most probable outcomes adding up to more than CHANCE_PROBABILITY_MASS, most probable first, with normalized probabilities"""
+    kept = []
+    mass = 0
+    for proba,changes in sorted(outcomes,key=lambda x:x[0],reverse=True):
+        kept.append((proba,changes))
+        mass += proba
+        if mass > CHANCE_PROBABILITY_MASS:
+            break
+    return [(proba/mass,changes) for proba,changes in kept]
+
+
+def _is_leaf(game_state,rec_depth):
+    return rec_depth == 0 or len(game_state.ENEMY_POSITIONS) == 0 or len(game_state.TEAM_POSITIONS) == 0
+
+
+def _search_outcome(game_state,changes,rec_depth,alpha,beta,deadline):
+    undo_log = game_state.do_move(changes)
+    try:
+        score,_ = alpha_beta(game_state,rec_depth-1,alpha,beta,deadline,False)
+    finally:
+        game_state.undo_move(undo_log)
+    return score
+
+
+def _probe_outcome(game_state,changes,rec_depth,beta,deadline):
+    """Lower bound of the score of an outcome, from the search of its first move only.
+
+    Returns the bound and whether it is the exact score, which is the case for leaves and for the
+    solved endgames, whose score does not come from the search of their first move.
+    """
+    undo_log = game_state.do_move(changes)
+    try:
+        if _is_leaf(game_state,rec_depth-1):
+            score,_ = alpha_beta(game_state,rec_depth-1,MIN_SCORE,MAX_SCORE,deadline,False)
+            return score,True
+        if ENDGAME_SOLVER and is_endgame(game_state):
+            solved = solve_endgame(game_state,GAMMA,lambda:check_deadline(deadline))
+            if solved is not None:
+                return solved[0],True
+        entry = TRANSPOSITION_TABLE.lookup(game_state.HASH)
+        best_move = entry.move if entry is not None else None
+        move = next(ordered_moves(game_state,rec_depth-1,False,best_move,MOVE_ORDERING),None)
+        if move is None:
+            return MIN_SCORE,False
+        score = search_move(game_state,move,rec_depth-1,MIN_SCORE,beta,deadline)
+        if score <= MIN_SCORE:
+            return MIN_SCORE,False
+        if entry is None or entry.depth < rec_depth-1:
+            TRANSPOSITION_TABLE.store(game_state.HASH,rec_depth-1,LOWER_BOUND,score,move)
+        return score,False
+    finally:
+        game_state.undo_move(undo_log)
+
+
+def alpha_beta_proba(game_state,outcomes,rec_depth,alpha,beta,deadline=None):
+    """Expected score of a chance node, the outcomes are the (probability, changes) of a move from game_state
+
+    With CHANCE_PRUNING, the scores being bounded by MIN_SCORE and MAX_SCORE, the search stops as soon
+    as the expected score is known to be out of the window (Star1). Lower bounds of the scores of all
+    the outcomes are first probed by searching only their first move (Star2), unless beta is at least
+    STAR2_MAX_BETA: with beta at MAX_SCORE the probes cannot cut and cost more than they save.
+    """
+    outcomes = probable_outcomes(outcomes)
+    if not CHANCE_PRUNING:
+        score = 0
+        for proba,changes in outcomes:
+            score += proba*_search_outcome(game_state,changes,rec_depth,alpha,beta,deadline)
+        return score,None
+
+    # Star2 probing phase
+    lower_bounds = []
+    exact = []
+    lower_sum = MIN_SCORE
+    for proba,changes in (outcomes if beta < STAR2_MAX_BETA else ()):
+        child_beta = min((beta - lower_sum + proba*MIN_SCORE)/proba,MAX_SCORE)
+        lower_bound,is_exact = _probe_outcome(game_state,changes,rec_depth,child_beta,deadline)
+        lower_bounds.append(lower_bound)
+        exact.append(is_exact)
+        lower_sum += proba*(lower_bound - MIN_SCORE)
+        if lower_sum >= beta:
+            return beta,None
+
+    if not lower_bounds:
+        lower_bounds = [MIN_SCORE]*len(outcomes)
+        exact = [False]*len(outcomes)
+
+    # Star1 search phase
     score = 0
-    most_probable_states = sorted(game_states,key=lambda x:x[0])
-    probas = [p for p,_ in most_probable_states]
-    i = 0
-    while sum(probas[i:]) > 0.8:
-        i +=1
-    for proba,game_state in most_probable_states[i-1:]:
-        rec_score,_ = alpha_beta(game_state,rec_depth-1,alpha,beta)
+    remaining_proba = 1
+    remaining_lower_sum = lower_sum
+    for (proba,changes),lower_bound,is_exact in zip(outcomes,lower_bounds,exact):
+        remaining_proba -= proba
+        remaining_lower_sum -= proba*lower_bound
+        child_alpha = (alpha - score - remaining_proba*MAX_SCORE)/proba
+        child_beta = (beta - score - remaining_lower_sum)/proba
+        if child_alpha >= MAX_SCORE:
+            return alpha,None
+        if child_beta <= lower_bound:
+            return beta,None
+        if is_exact:
+            rec_score = lower_bound
+        else:
+            rec_score = _search_outcome(game_state,changes,rec_depth,max(child_alpha,lower_bound),min(child_beta,MAX_SCORE),deadline)
+        if rec_score >= child_beta:
+            return beta,None
+        if rec_score <= child_alpha:
+            return alpha,None
         score += proba*rec_score
-    return score/sum(probas[i-1:]),None
+    return score,None
+
+
+def iterative_deepening(game_state,deadline,max_depth=MAX_DEPTH,search=None,known_result=None,on_result=None):
+    """Search at depth 1, 2, 3... until the deadline and return the result of the last completed depth.
+
+    The depth 1 search ignores the deadline so that a move is always available. A known_result
+    (depth, score, move) of an earlier search of the position, like pondering, is deepened instead.
+    on_result is called with the (depth, score, move) of each completed depth.
+    """
+    if search is None:
+        search = alpha_beta
+    if known_result is not None:
+        start_depth,score,move = known_result
+    else:
+        start_depth = 1
+        score,move = search(game_state,1)
+    if on_result is not None:
+        on_result(start_depth,score,move)
+    for rec_depth in range(start_depth+1,max_depth+1):
+        if time.time() > deadline:
+            break
+        try:
+            score,move = search(game_state,rec_depth,deadline=deadline)
+        except SearchTimeout:
+            break
+        if on_result is not None:
+            on_result(rec_depth,score,move)
+    return score,move
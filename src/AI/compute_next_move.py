@@ -1,12 +1,72 @@
-from AI.alpha_beta import alpha_beta
+from state import DIRECTIONS
+from AI.alpha_beta import alpha_beta, iterative_deepening, TRANSPOSITION_TABLE, REC_DEPTH
+from AI.parallel import parallel_alpha_beta
+from AI.mcts import mcts, parallel_mcts
+from AI import move_ordering
 
 def format_moves_for_response(moves):
     return [[source[0],source[1],nb,dest[0],dest[1]] for source,nb,dest in moves]
 
 
-def compute_next_move(game_state, ai_mode):
+def parse_moves_from_response(moves):
+    return frozenset(((x,y),nb,(x2,y2)) for x,y,nb,x2,y2 in moves)
+
+
+def fallback_move(game_state):
+    """Move sent when the search has not given one: the first move of the search, or else any group to a cell next to it"""
+    move = next(game_state.get_next_moves(),None) or next(game_state.get_possible_moves(),None)
+    if move is not None or not game_state.TEAM_POSITIONS:
+        return move
+    m,n = game_state.SIZE
+    i,j = min(game_state.TEAM_POSITIONS)
+    k,l = next((i+di,j+dj) for di,dj in DIRECTIONS if 0 <= i+di < m and 0 <= j+dj < n)
+    return frozenset({((i,j),game_state.get_units(i,j,game_state.TEAM),(k,l))})
+
+
+def compute_next_move(game_state, ai_mode, deadline=None, known_result=None, on_result=None, book=None):
+    """Best move of game_state as (number of moves, moves for the server).
+
+    A book (OpeningBook) gives the result of a previous game for the position, deepened like
+    known_result, and the depth reached by this search is written back to it. The MCTS modes search
+    until the deadline and ignore known_result and the book.
+    """
+    if book is not None and deadline is not None and ai_mode in ("alpha_beta", "parallel_alpha_beta"):
+        book_result = book.lookup(game_state)
+        if book_result is not None and (known_result is None or book_result[0] > known_result[0]) and game_state.is_next_move(book_result[2],True):
+            known_result = book_result
+        searched = []
+
+        def record_result(depth, score, move, on_result=on_result):
+            searched[:] = [depth,score,move]
+            if on_result is not None:
+                on_result(depth,score,move)
+        on_result = record_result
+        try:
+            return compute_next_move(game_state, ai_mode, deadline, known_result, on_result)
+        finally:
+            # also when the search is stopped, the completed depths are kept
+            if searched:
+                book.store(game_state, *searched)
     if ai_mode == "alpha_beta":
-        score,move = alpha_beta(game_state)
+        TRANSPOSITION_TABLE.new_search()
+        move_ordering.new_search()
+        if deadline is None:
+            score,move = alpha_beta(game_state)
+        else:
+            score,move = iterative_deepening(game_state, deadline, known_result=known_result, on_result=on_result)
+        return len(move), format_moves_for_response(move)
+    elif ai_mode == "parallel_alpha_beta":
+        TRANSPOSITION_TABLE.new_search()
+        if deadline is None:
+            score,move = parallel_alpha_beta(game_state, REC_DEPTH)
+        else:
+            score,move = iterative_deepening(game_state, deadline, search=parallel_alpha_beta, known_result=known_result, on_result=on_result)
+        return len(move), format_moves_for_response(move)
+    elif ai_mode == "mcts":
+        score,move = mcts(game_state, deadline, on_result=on_result)
+        return len(move), format_moves_for_response(move)
+    elif ai_mode == "parallel_mcts":
+        score,move = parallel_mcts(game_state, deadline, on_result=on_result)
         return len(move), format_moves_for_response(move)
     else:
         raise Exception("wrong AI selected")
@@ -0,0 +1,182 @@
+from collections import OrderedDict
+
+from state import SparseGameState
+
+# Positions without humans and with at most these groups (both teams) and units are solved
+ENDGAME_MAX_GROUPS = 3
+ENDGAME_MAX_UNITS = 40
+# Largest side of the rectangle holding the groups, the number of positions to solve grows with its area
+ENDGAME_MAX_SPREAD = 8
+# Moves searched from a position before giving up solving it
+ENDGAME_MAX_PLIES = 24
+# Positions whose value is kept, the least recently used are dropped
+ENDGAME_CACHE_SIZE = 2**16
+
+# Scores of the finished games, the same as heuristic, MAX_SCORE and MIN_SCORE in alpha_beta
+WIN_SCORE = 100
+LOSS_SCORE = -100
+DRAW_SCORE = 0
+
+# Transpose, flip the rows and flip the columns: the 8 symmetries of the board
+SYMMETRIES = [(transpose, di, dj) for transpose in (False, True) for di in (1, -1) for dj in (1, -1)]
+
+
+class EndgameCache:
+    """Bounded mapping of canonical keys to scores, dropping the least recently used entries"""
+
+    def __init__(self, size=ENDGAME_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Kept for the whole game, the values do not depend on the turn
+ENDGAME_CACHE = EndgameCache()
+# Entry of the positions which could not be solved within ENDGAME_MAX_PLIES
+UNSOLVED = object()
+
+
+def is_endgame(game_state):
+    if (
+        game_state.HUMAN_POSITIONS
+        or len(game_state.TEAM_POSITIONS) + len(game_state.ENEMY_POSITIONS) > ENDGAME_MAX_GROUPS
+        or game_state.UNITS[1] + game_state.UNITS[2] > ENDGAME_MAX_UNITS
+    ):
+        return False
+    rows, columns = zip(*(game_state.TEAM_POSITIONS | game_state.ENEMY_POSITIONS))
+    return max(max(rows) - min(rows), max(columns) - min(columns)) < ENDGAME_MAX_SPREAD
+
+
+def canonical_key(game_state):
+    """Key of the groups of the position, the same for its translations and symmetries.
+
+    Without humans the moves only go towards the enemies and stay between the groups, so the value
+    of a position does not depend on the board edges. The units of the player to move are positive,
+    those of the other player negative, so that the key does not depend on the team to move either.
+    """
+    groups = [(i, j, game_state.get_units(i, j, game_state.TEAM)) for i, j in game_state.TEAM_POSITIONS]
+    groups += [(i, j, -game_state.get_units(i, j, game_state.ENEMY_TEAM)) for i, j in game_state.ENEMY_POSITIONS]
+    keys = []
+    for transpose, di, dj in SYMMETRIES:
+        cells = [(j*dj, i*di, units) if transpose else (i*di, j*dj, units) for i, j, units in groups]
+        min_i = min(i for i, _, _ in cells)
+        min_j = min(j for _, j, _ in cells)
+        keys.append(tuple(sorted((i - min_i, j - min_j, units) for i, j, units in cells)))
+    return min(keys)
+
+
+def _sparse_copy(game_state):
+    """SparseGameState of the groups of game_state, whose moves do not update a summed-area table"""
+    if isinstance(game_state, SparseGameState):
+        return game_state.copy()
+    sparse = SparseGameState()
+    sparse.SIZE = game_state.SIZE
+    sparse.TEAM = game_state.TEAM
+    sparse.ENEMY_TEAM = game_state.ENEMY_TEAM
+    sparse.update_board([(i, j, *game_state.get_cell(i, j)) for i, j in game_state.TEAM_POSITIONS | game_state.ENEMY_POSITIONS])
+    return sparse
+
+
+class _Solver:
+    """Expectimax of the positions reached from an endgame position, each one searched once"""
+
+    def __init__(self, gamma, cache, check=None):
+        self.gamma = gamma
+        self.cache = cache
+        self.check = check
+        # scores of the positions cut by the ply limit, by key, with the plies they were searched with
+        self.partial = {}
+
+    def solve(self, game_state, plies):
+        """(score, exact) of game_state for the player to move"""
+        if not game_state.ENEMY_POSITIONS:
+            return (WIN_SCORE if game_state.TEAM_POSITIONS else DRAW_SCORE), True
+        if not game_state.TEAM_POSITIONS:
+            return LOSS_SCORE, True
+        key = canonical_key(game_state)
+        score = self.cache.get(key)
+        if score is not None and score is not UNSOLVED:
+            return score, True
+        if key in self.partial and self.partial[key][0] >= plies:
+            return self.partial[key][1], False
+        if plies == 0:
+            return DRAW_SCORE, False
+        if self.check is not None:
+            self.check()
+
+        best_score, exact = None, True
+        for move in game_state.get_next_moves():
+            score, move_exact = self.move_score(game_state, move, plies)
+            exact = exact and move_exact
+            if best_score is None or score > best_score:
+                best_score = score
+        if best_score is None:
+            return DRAW_SCORE, False
+        if exact:
+            self.cache.put(key, best_score)
+        else:
+            self.partial[key] = (plies, best_score)
+        return best_score, exact
+
+    def move_score(self, game_state, move, plies):
+        """Expected score of move for the player making it, the probabilities of the outcomes normalized"""
+        outcomes = game_state.get_move_outcomes(move)
+        total_proba = sum(proba for proba, _ in outcomes)
+        score, exact = 0, True
+        for proba, changes in outcomes:
+            undo_log = game_state.do_move(changes)
+            try:
+                outcome_score, outcome_exact = self.solve(game_state, plies - 1)
+            finally:
+                game_state.undo_move(undo_log)
+            score += proba*outcome_score
+            exact = exact and outcome_exact
+        return -self.gamma*score/total_proba, exact
+
+
+def solve_endgame(game_state, gamma, check=None, max_plies=ENDGAME_MAX_PLIES, cache=ENDGAME_CACHE):
+    """Exact (score, best move) of an endgame position for the player to move, None if it is too long to solve.
+
+    The score is the expected result with the moves of get_next_moves, WIN_SCORE or LOSS_SCORE
+    discounted by gamma at each move like in alpha_beta. check is called at each position solved,
+    it can stop the search by raising an exception, the positions already solved staying cached.
+    """
+    key = canonical_key(game_state)
+    if cache.get(key) is UNSOLVED:
+        return None
+    solver = _Solver(gamma, cache, check)
+    sparse = _sparse_copy(game_state)
+    best_score, best_move = None, None
+    for move in sparse.get_next_moves():
+        score, exact = solver.move_score(sparse, move, max_plies)
+        if not exact:
+            cache.put(key, UNSOLVED)
+            return None
+        if best_score is None or score > best_score:
+            best_score, best_move = score, move
+    if best_move is None:
+        return None
+    cache.put(key, best_score)
+    return best_score, best_move
@@ -0,0 +1,167 @@
+import json
+import os
+import time
+
+import AI.alpha_beta
+import AI.compute_next_move
+import AI.mcts
+import AI.ponder
+from AI.alpha_beta import CUTOFF_STATS, TRANSPOSITION_TABLE
+from state import GameState
+
+# Modes whose nodes are searched in other processes, which the tracer does not see
+PARALLEL_MODES = ("parallel_alpha_beta", "parallel_mcts")
+
+
+class SearchTracer:
+    """Opt-in statistics of the searches, written as one JSON line per turn.
+
+    While enabled, the functions of the search are replaced by counting and timing wrappers, also
+    where the modules of the other searches imported them, the search runs unchanged when disabled.
+    Only the nodes searched in this process during the turn are seen: the lines of the parallel
+    modes, which search in the workers, and of the turns deepening a pondered or warm up result,
+    searched before the turn, are marked partial.
+    """
+
+    def __init__(self, path, ai_mode=None):
+        self.file = open(path, "a")
+        self.ai_mode = ai_mode
+        # lines of all the games of a log file can be aggregated, and grouped by game
+        self.game = f"{os.getpid()}-{int(time.time())}"
+        self.turn = 0
+        self.stats = None
+        self._originals = []
+
+    def _patch(self, owner, name, wrapper):
+        original = getattr(owner, name)
+        self._originals.append((owner, name, original))
+        setattr(owner, name, wrapper(original))
+
+    def _counted(self, counter):
+        def wrapper(function):
+            def counted(*args, **kwargs):
+                self.stats[counter] += 1
+                return function(*args, **kwargs)
+            return counted
+        return wrapper
+
+    def _timed(self, timer):
+        def wrapper(function):
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.stats[timer] += time.perf_counter() - start
+            return timed
+        return wrapper
+
+    def _timed_generator(self, timer):
+        """Time spent generating the items of the generators returned by a function"""
+        def wrapper(function):
+            def timed(*args, **kwargs):
+                generator = function(*args, **kwargs)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        self.stats[timer] += time.perf_counter() - start
+                    yield item
+            return timed
+        return wrapper
+
+    def enable(self):
+        if self._originals:
+            return
+        self.new_turn()
+
+        def count_node(alpha_beta):
+            def counted(game_state, rec_depth=AI.alpha_beta.REC_DEPTH, *args, **kwargs):
+                nodes = self.stats["nodes_per_depth"]
+                nodes[rec_depth] = nodes.get(rec_depth, 0) + 1
+                return alpha_beta(game_state, rec_depth, *args, **kwargs)
+            return counted
+
+        def count_chance_node(alpha_beta_proba):
+            def counted(game_state, outcomes, *args, **kwargs):
+                self.stats["chance_nodes"] += 1
+                self.stats["chance_outcomes"] += len(outcomes)
+                return alpha_beta_proba(game_state, outcomes, *args, **kwargs)
+            return counted
+
+        # the root calls of compute_next_move and of the ponderer
+        for module in (AI.alpha_beta, AI.compute_next_move, AI.ponder):
+            self._patch(module, "alpha_beta", count_node)
+        self._patch(AI.alpha_beta, "alpha_beta_proba", count_chance_node)
+        self._patch(AI.alpha_beta, "_search_outcome", self._counted("outcomes_searched"))
+        self._patch(AI.alpha_beta, "_probe_outcome", self._counted("outcomes_probed"))
+        self._patch(AI.mcts.MCTS, "iterate", self._counted("mcts_iterations"))
+        for module in (AI.alpha_beta, AI.mcts):
+            self._patch(module, "heuristic", self._counted("evaluations"))
+            self._patch(module, "heuristic", self._timed("evaluation_time"))
+        for module in (AI.alpha_beta, AI.mcts, AI.ponder):
+            self._patch(module, "ordered_moves", self._timed_generator("move_generation_time"))
+        for name in ("get_move_outcomes", "do_move", "undo_move"):
+            self._patch(GameState, name, self._timed("move_application_time"))
+
+    def disable(self):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def new_turn(self):
+        self.stats = {
+            "nodes_per_depth": {},
+            "chance_nodes": 0,
+            "chance_outcomes": 0,
+            "outcomes_searched": 0,
+            "outcomes_probed": 0,
+            "mcts_iterations": 0,
+            "evaluations": 0,
+            "evaluation_time": 0,
+            "move_generation_time": 0,
+            "move_application_time": 0,
+        }
+        self.depth = None
+        self.score = None
+        self._cutoffs = dict(CUTOFF_STATS)
+        self._tt_counts = (TRANSPOSITION_TABLE.hits, TRANSPOSITION_TABLE.misses)
+        self._start = time.perf_counter()
+
+    def on_result(self, depth, score, move):
+        """Callback of iterative_deepening, to record the depth reached"""
+        self.depth = depth
+        self.score = float(score)
+
+    def end_turn(self, **info):
+        """Write the statistics of the turn since new_turn, with the info given, and start a new turn"""
+        self.turn += 1
+        stats = self.stats
+        line = {
+            "game": self.game,
+            "turn": self.turn,
+            "time": time.time(),
+            "ai_mode": self.ai_mode,
+            "elapsed": time.perf_counter() - self._start,
+            "depth": self.depth,
+            "score": self.score,
+            "partial": self.ai_mode in PARALLEL_MODES or bool(info.get("pondered")),
+            **info,
+            "nodes": sum(stats["nodes_per_depth"].values()),
+            **stats,
+            "nodes_per_depth": {str(depth): nodes for depth, nodes in sorted(stats["nodes_per_depth"].items())},
+            "cutoffs": CUTOFF_STATS["cutoffs"] - self._cutoffs["cutoffs"],
+            "first_move_cutoffs": CUTOFF_STATS["first_move_cutoffs"] - self._cutoffs["first_move_cutoffs"],
+            "tt_hits": TRANSPOSITION_TABLE.hits - self._tt_counts[0],
+            "tt_misses": TRANSPOSITION_TABLE.misses - self._tt_counts[1],
+        }
+        self.file.write(json.dumps(line) + "\n")
+        self.file.flush()
+        self.new_turn()
+
+    def close(self):
+        self.disable()
+        self.file.close()
@@ -0,0 +1,235 @@
+import math
+import random
+import time
+from concurrent.futures import wait
+from itertools import islice
+
+from AI.alpha_beta import heuristic, STOP_SEARCH, GAMMA, MIN_SCORE
+from AI.move_ordering import ordered_moves, sub_move_priority
+from AI import parallel
+
+# Exploration constant of UCT, for values scaled to [-1, 1]
+EXPLORATION = 1.0
+# A node with n visits has at most WIDENING_COEFF*n**WIDENING_EXPONENT children (progressive widening)
+WIDENING_COEFF = 1.0
+WIDENING_EXPONENT = 0.5
+# Bounds of the splits of the wide move sets, given to get_possible_moves
+MIN_GROUP_SIZE = 2
+MAX_NUMBER_GROUP = 4
+# Random moves played from a new leaf before evaluating it, among the ROLLOUT_WIDTH most promising ones
+ROLLOUT_PLIES = 2
+ROLLOUT_WIDTH = 4
+# Iterations of a search without deadline
+MCTS_ITERATIONS = 2000
+# Iterations between two calls of on_result
+REPORT_INTERVAL = 100
+# Seconds before the deadline at which the workers of parallel_mcts stop, to merge their trees in time
+MERGE_MARGIN = 0.05
+
+
+class StateNode:
+    """Position of the tree, its value is for the player to move"""
+    __slots__ = ("moves", "seen", "children", "visits", "value")
+
+    def __init__(self):
+        self.moves = None
+        self.seen = set()
+        self.children = []
+        self.visits = 0
+        self.value = 0
+
+
+class MoveNode:
+    """Move of the parent position, its value is for the player making the move.
+
+    The battles of the move are not expanded: an outcome is drawn with its probability at each
+    visit, and the position it leads to is created the first time it is drawn.
+    """
+    __slots__ = ("move", "probas", "outcomes", "states", "visits", "value")
+
+    def __init__(self, move, outcomes):
+        self.move = move
+        self.probas = [proba for proba, _ in outcomes]
+        self.outcomes = [changes for _, changes in outcomes]
+        self.states = {}
+        self.visits = 0
+        self.value = 0
+
+
+def widened_moves(game_state):
+    """Moves of game_state for the progressive widening, generated lazily.
+
+    The moves of alpha_beta come first, most promising first, then the other moves of
+    get_possible_moves, which also splits the groups and moves away from the humans and enemies.
+    The generator must only be advanced while game_state is in the position it was created for.
+    """
+    yield from ordered_moves(game_state, 0, True)
+    yield from game_state.get_possible_moves(MIN_GROUP_SIZE, MAX_NUMBER_GROUP, sub_move_priority(game_state))
+
+
+def _is_terminal(game_state):
+    return len(game_state.TEAM_POSITIONS) == 0 or len(game_state.ENEMY_POSITIONS) == 0
+
+
+def rollout(game_state, generator, nb_plies=ROLLOUT_PLIES):
+    """Score of game_state for the player to move, after a few random plies"""
+    undo_logs = []
+    try:
+        for _ in range(nb_plies):
+            if _is_terminal(game_state):
+                break
+            moves = list(islice(ordered_moves(game_state, 0), ROLLOUT_WIDTH))
+            if not moves:
+                break
+            outcomes = game_state.get_move_outcomes(generator.choice(moves))
+            _, changes = generator.choices(outcomes, weights=[proba for proba, _ in outcomes])[0]
+            undo_logs.append(game_state.do_move(changes))
+        score = heuristic(game_state)
+        # back to the point of view of the player to move in the leaf
+        return score if len(undo_logs) % 2 == 0 else -score
+    finally:
+        for undo_log in reversed(undo_logs):
+            game_state.undo_move(undo_log)
+
+
+class MCTS:
+    """Monte Carlo tree search with UCT and progressive widening, the tree being kept between iterations"""
+
+    def __init__(self, game_state, seed=None):
+        self.game_state = game_state.copy()
+        self.generator = random.Random(seed)
+        self.root = StateNode()
+        self.iterations = 0
+        self.max_depth = 0
+
+    def _select(self, node):
+        log_visits = math.log(node.visits)
+        return max(
+            node.children,
+            key=lambda child: child.value/child.visits/100 + EXPLORATION*math.sqrt(log_visits/child.visits)
+        )
+
+    def _expand(self, node):
+        """A new child of node if its visits allow one more, None otherwise"""
+        if node.moves is None:
+            node.moves = widened_moves(self.game_state)
+        if len(node.children) >= max(1, WIDENING_COEFF*node.visits**WIDENING_EXPONENT):
+            return None
+        for move in node.moves:
+            if move not in node.seen:
+                node.seen.add(move)
+                child = MoveNode(move, self.game_state.get_move_outcomes(move))
+                node.children.append(child)
+                return child
+        return None
+
+    def iterate(self):
+        game_state = self.game_state
+        node = self.root
+        path = []
+        undo_logs = []
+        try:
+            while True:
+                if _is_terminal(game_state):
+                    score = heuristic(game_state)
+                    break
+                child = self._expand(node)
+                if child is None:
+                    if not node.children:
+                        score = heuristic(game_state)
+                        break
+                    child = self._select(node)
+                index = self.generator.choices(range(len(child.outcomes)), weights=child.probas)[0]
+                undo_logs.append(game_state.do_move(child.outcomes[index]))
+                path.append((node, child))
+                if index not in child.states:
+                    node = child.states[index] = StateNode()
+                    score = rollout(game_state, self.generator)
+                    break
+                node = child.states[index]
+        finally:
+            for undo_log in reversed(undo_logs):
+                game_state.undo_move(undo_log)
+
+        node.visits += 1
+        node.value += score
+        for parent, child in reversed(path):
+            score = -GAMMA*score
+            child.visits += 1
+            child.value += score
+            parent.visits += 1
+            parent.value += score
+        self.iterations += 1
+        self.max_depth = max(self.max_depth, len(path))
+
+    def root_stats(self):
+        """(move, visits, value) of the children of the root"""
+        return [(child.move, child.visits, child.value) for child in self.root.children]
+
+    def search(self, deadline=None, iterations=MCTS_ITERATIONS, on_result=None, stop=STOP_SEARCH):
+        """Iterate until the deadline or stop is set, or iterations times without deadline, and return the best (score, move)"""
+        while deadline is not None or self.iterations < iterations:
+            if (deadline is not None and time.time() > deadline) or stop.is_set():
+                break
+            self.iterate()
+            if on_result is not None and self.iterations % REPORT_INTERVAL == 0:
+                on_result(self.max_depth, *best_move(self.root_stats()))
+        return best_move(self.root_stats())
+
+
+def best_move(stats):
+    """Most visited move as (mean score, move)"""
+    if not stats:
+        return MIN_SCORE, None
+    move, visits, value = max(stats, key=lambda stat: stat[1])
+    return value/visits, move
+
+
+def mcts(game_state, deadline=None, iterations=MCTS_ITERATIONS, on_result=None):
+    search = MCTS(game_state)
+    score, move = search.search(deadline, iterations, on_result)
+    if on_result is not None:
+        on_result(search.max_depth, score, move)
+    return score, move
+
+
+def _search_worker(game_state, deadline, iterations, seed):
+    search = MCTS(game_state, seed)
+    search.search(deadline, iterations, stop=parallel.SHARED_STOP)
+    return search.root_stats(), search.max_depth
+
+
+def parallel_mcts(game_state, deadline=None, iterations=MCTS_ITERATIONS, on_result=None):
+    """Root parallel MCTS on the process pool of AI.parallel.
+
+    Each worker grows its own tree with its own random outcomes, the visits and values of the root
+    moves of all the trees are added up to choose the move. The workers stop MERGE_MARGIN before the
+    deadline, or as soon as STOP_SEARCH is set, and on_result is called each time a tree is merged.
+    """
+    parallel.SHARED_STOP.clear()
+    worker_deadline = None if deadline is None else deadline - MERGE_MARGIN
+    not_done = [
+        parallel.POOL.submit(_search_worker, game_state, worker_deadline, -(-iterations//parallel.WORKERS), seed)
+        for seed in range(parallel.WORKERS)
+    ]
+    stats = {}
+    max_depth = 0
+    score, move = MIN_SCORE, None
+    try:
+        while not_done:
+            done, not_done = wait(not_done, timeout=parallel.STOP_POLL_INTERVAL)
+            if STOP_SEARCH.is_set():
+                parallel.SHARED_STOP.set()
+            for future in done:
+                root_stats, depth = future.result()
+                max_depth = max(max_depth, depth)
+                for stat_move, visits, value in root_stats:
+                    total_visits, total_value = stats.get(stat_move, (0, 0))
+                    stats[stat_move] = (total_visits + visits, total_value + value)
+                score, move = best_move([(stat_move, visits, value) for stat_move, (visits, value) in stats.items()])
+                if on_result is not None:
+                    on_result(max_depth, score, move)
+    finally:
+        # the other workers are stopped if one of them failed
+        parallel.SHARED_STOP.set()
+    return score, move
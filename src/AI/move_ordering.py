@@ -0,0 +1,108 @@
+from functools import lru_cache
+
+from battle import enemy_battle_outcomes, BATTLE_CACHE_SIZE
+
+KILLER_SLOTS = 2
+# Bits of a sub-move priority above which the sure captures and the favorable battles are counted,
+# the history score taking the bits below
+CAPTURE_SHIFT = 48
+BATTLE_SHIFT = 32
+
+# Quiet moves which caused a beta cut, by remaining depth
+KILLER_MOVES = {}
+# Sum of depth**2 over the beta cuts caused by a move from source to destination
+HISTORY = {}
+
+
+def new_search():
+    """Forget the killer moves of the previous turn and age the history table"""
+    KILLER_MOVES.clear()
+    for key in list(HISTORY):
+        HISTORY[key] //= 2
+        if HISTORY[key] == 0:
+            del HISTORY[key]
+
+
+def capture_gain(game_state,n_units,destination):
+    """Units won by sending n_units to destination without a battle: humans converted or enemies killed"""
+    humans,team1,team2 = game_state.get_cell(*destination)
+    enemies = team1 if game_state.ENEMY_TEAM == 1 else team2
+    if humans > 0 and n_units >= humans:
+        return humans
+    if enemies > 0 and n_units >= 1.5*enemies:
+        return enemies
+    return 0
+
+
+@lru_cache(maxsize=BATTLE_CACHE_SIZE)
+def _expected_kills(n_units,enemies):
+    """Enemies expected to be killed by n_units in a battle won with a probability above 0.5, rounded down, 0 otherwise"""
+    team_wins,_ = enemy_battle_outcomes(n_units,enemies)
+    p_win = sum(proba for proba,_ in team_wins)
+    if p_win <= 0.5:
+        return 0
+    return int(p_win*enemies)
+
+
+def battle_gain(game_state,n_units,destination):
+    """Enemies expected to be killed by sending n_units to destination, for the battles which are favorable"""
+    _,team1,team2 = game_state.get_cell(*destination)
+    enemies = team1 if game_state.ENEMY_TEAM == 1 else team2
+    if enemies == 0 or n_units >= 1.5*enemies or 1.5*n_units <= enemies:
+        return 0
+    return _expected_kills(n_units,enemies)
+
+
+def sub_move_priority(game_state):
+    """Priority of a sub-move for GameState.get_next_moves: the units captured first, then the enemies
+    expected to be killed in a favorable battle, then the history score"""
+    gains = {}
+
+    def priority(source,n_units,destination):
+        key = (n_units,destination)
+        if key not in gains:
+            gains[key] = (capture_gain(game_state,n_units,destination) << CAPTURE_SHIFT) + (battle_gain(game_state,n_units,destination) << BATTLE_SHIFT)
+        return gains[key] + HISTORY.get((source,destination),0)
+
+    return priority
+
+
+def ordered_moves(game_state,rec_depth,with_split=False,best_move=None,use_heuristics=True):
+    """Moves of game_state from the most to the least promising, generated lazily.
+
+    The best move found by a previous search comes first, then the moves capturing humans or
+    killing enemies without a battle, then the killer moves, then the moves starting battles won
+    with a probability above 0.5 and then the other moves by history score. Without the heuristics
+    only the best move is moved first.
+    """
+    tried = []
+    if best_move is not None and game_state.is_next_move(best_move,with_split):
+        tried.append(best_move)
+        yield best_move
+    if not use_heuristics:
+        yield from (move for move in game_state.get_next_moves(with_split) if move not in tried)
+        return
+
+    killers = KILLER_MOVES.get(rec_depth,())
+    priority = sub_move_priority(game_state)
+    for move in game_state.get_next_moves(with_split,priority):
+        if killers and not any(priority(*sub_move) >> CAPTURE_SHIFT for sub_move in move):
+            for killer in killers:
+                if killer not in tried and game_state.is_next_move(killer,with_split):
+                    tried.append(killer)
+                    yield killer
+            killers = ()
+        if move not in tried:
+            yield move
+
+
+def record_cutoff(game_state,move,rec_depth):
+    """Update the killer moves and the history table after move caused a beta cut"""
+    for source,_,destination in move:
+        HISTORY[(source,destination)] = HISTORY.get((source,destination),0) + rec_depth*rec_depth
+    if any(capture_gain(game_state,n_units,destination) for _,n_units,destination in move):
+        return
+    killers = KILLER_MOVES.setdefault(rec_depth,[])
+    if move not in killers:
+        killers.insert(0,move)
+        del killers[KILLER_SLOTS:]
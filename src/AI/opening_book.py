@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+
+from state import zobrist_key, ZOBRIST_SIDE_KEY
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Sub-moves kept for a move, the positions whose best move has more are not stored
+BOOK_MOVES = 8
+# Depth from which a search result is written to the book
+BOOK_MIN_DEPTH = 4
+# Bumped when the scores of the search change, the books written by other versions are dropped
+BOOK_VERSION = 2
+
+BOOK_DTYPE = np.dtype([
+    ("key", "<u8"),
+    ("version", "u1"),
+    ("depth", "u1"),
+    ("score", "<f8"),
+    ("nb_moves", "u1"),
+    # (x, y, n_units, x2, y2) of each sub-move, as sent to the server
+    ("moves", "u1", (BOOK_MOVES, 5)),
+])
+
+
+def position_key(game_state):
+    """Hash of the board, its size and the team to move, whatever the moves that led to it"""
+    key = zobrist_key(*game_state.SIZE, 3, 1)
+    for i, j in game_state.TEAM_POSITIONS | game_state.ENEMY_POSITIONS | game_state.HUMAN_POSITIONS:
+        for channel, count in enumerate(game_state.get_cell(i, j)):
+            key ^= zobrist_key(i, j, channel, count)
+    if game_state.TEAM == 2:
+        key ^= ZOBRIST_SIDE_KEY
+    return key
+
+
+def _is_current(entries):
+    """Whether the entries of a book file were written with the current format and scores"""
+    return entries.dtype == BOOK_DTYPE and bool(np.all(entries["version"] == BOOK_VERSION))
+
+
+class OpeningBook:
+    """Best moves of positions searched in previous games, stored on disk.
+
+    The entries are a .npy array sorted by position key, memory-mapped when loading and searched by
+    bisection. New results are kept in memory until save, which merges them with the file, keeping
+    the deepest result of each position. A file of another BOOK_VERSION is loaded empty, and replaced
+    by the new results when saved.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.new_entries = {}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.path):
+            self.entries = np.load(self.path, mmap_mode="r")
+        if not os.path.exists(self.path) or not _is_current(self.entries):
+            self.entries = np.zeros(0, dtype=BOOK_DTYPE)
+        self.keys = self.entries["key"]
+
+    def __len__(self):
+        return len(self.entries) + len(self.new_entries)
+
+    def _find(self, key):
+        if key in self.new_entries:
+            return self.new_entries[key]
+        index = np.searchsorted(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            entry = self.entries[index]
+            move = frozenset(((x, y), n_units, (x2, y2)) for x, y, n_units, x2, y2 in entry["moves"][:entry["nb_moves"]].tolist())
+            return int(entry["depth"]), float(entry["score"]), move
+        return None
+
+    def lookup(self, game_state):
+        """(depth, score, move) of a previous search of the position, or None"""
+        return self._find(position_key(game_state))
+
+    def store(self, game_state, depth, score, move):
+        """Keep a search result if it is deep enough and deeper than the known one"""
+        if depth < BOOK_MIN_DEPTH or move is None or len(move) > BOOK_MOVES:
+            return
+        key = position_key(game_state)
+        known = self._find(key)
+        if known is None or known[0] < depth:
+            self.new_entries[key] = (depth, float(score), move)
+
+    def _new_entries_array(self):
+        array = np.zeros(len(self.new_entries), dtype=BOOK_DTYPE)
+        for row, (key, (depth, score, move)) in zip(array, self.new_entries.items()):
+            row["key"], row["version"], row["depth"], row["score"], row["nb_moves"] = key, BOOK_VERSION, depth, score, len(move)
+            row["moves"][:len(move)] = [(*source, n_units, *destination) for source, n_units, destination in sorted(move)]
+        return array
+
+    def save(self):
+        """Merge the new entries with the file, which other games may have updated since it was loaded"""
+        if not self.new_entries:
+            return
+        with open(self.path + ".lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self.load()
+            entries = np.concatenate([np.asarray(self.entries), self._new_entries_array()])
+            # the deepest entry of each key comes first
+            entries = entries[np.lexsort((-entries["depth"].astype(np.int64), entries["key"]))]
+            _, first = np.unique(entries["key"], return_index=True)
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "wb") as book_file:
+                np.save(book_file, entries[first])
+            os.replace(temporary_path, self.path)
+            self.new_entries = {}
+            self.load()
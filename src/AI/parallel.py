@@ -0,0 +1,122 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_EXCEPTION, wait
+
+import AI.alpha_beta
+from AI.alpha_beta import search_move, TRANSPOSITION_TABLE
+from AI.transposition import EXACT
+from AI import move_ordering
+
+# Process pool created once by start_pool and kept for the whole game
+POOL = None
+WORKERS = 0
+# Best root score found by any worker during the current search
+SHARED_ALPHA = None
+# Set by the main process to stop the searches of the workers, like STOP_SEARCH in the main process
+SHARED_STOP = None
+# Seconds between two checks of STOP_SEARCH while waiting for the workers
+STOP_POLL_INTERVAL = 0.01
+
+
+def _init_worker(shared_alpha, shared_stop):
+    global SHARED_ALPHA, SHARED_STOP
+    SHARED_ALPHA = shared_alpha
+    SHARED_STOP = shared_stop
+    # check_deadline of the worker stops when the main process sets SHARED_STOP
+    AI.alpha_beta.STOP_SEARCH = shared_stop
+
+
+def start_pool(workers):
+    global POOL, WORKERS, SHARED_ALPHA, SHARED_STOP
+    if POOL is not None:
+        return
+    WORKERS = workers
+    SHARED_ALPHA = multiprocessing.Value('d', -100)
+    SHARED_STOP = multiprocessing.Event()
+    POOL = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(SHARED_ALPHA, SHARED_STOP))
+
+
+def stop_pool():
+    global POOL
+    if POOL is not None:
+        POOL.shutdown(cancel_futures=True)
+        POOL = None
+
+
+def wait_for_workers(futures):
+    """Wait for the futures of the workers, setting SHARED_STOP as soon as STOP_SEARCH is set.
+
+    The first exception of a worker, like SearchTimeout, is raised after stopping the other workers.
+    """
+    not_done = futures
+    try:
+        while not_done:
+            done, not_done = wait(not_done, timeout=STOP_POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+            if AI.alpha_beta.STOP_SEARCH.is_set():
+                SHARED_STOP.set()
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+    except BaseException:
+        SHARED_STOP.set()
+        for future in not_done:
+            future.cancel()
+        raise
+
+
+def _search_root_moves(game_state, moves, rec_depth, deadline, generation, use_move_ordering):
+    """Search some root moves in a worker, with the best root score of all the workers as alpha.
+
+    Returns the best (score, move) among the moves whose score beats the alpha they were searched
+    with, these scores are exact. The other moves are worse than the best move of some worker.
+    use_move_ordering is the MOVE_ORDERING of the main process, which may have changed since the pool started.
+    """
+    AI.alpha_beta.MOVE_ORDERING = use_move_ordering
+    # the tables of each worker live as long as the pool, they are aged at each new turn
+    if TRANSPOSITION_TABLE.generation != generation:
+        TRANSPOSITION_TABLE.generation = generation
+        move_ordering.new_search()
+    best_score, best_move = -100, None
+    for move in moves:
+        alpha = max(best_score, SHARED_ALPHA.value)
+        score = search_move(game_state, move, rec_depth, alpha, 100, deadline)
+        if score > alpha:
+            best_score, best_move = score, move
+            with SHARED_ALPHA.get_lock():
+                if score > SHARED_ALPHA.value:
+                    SHARED_ALPHA.value = score
+    return best_score, best_move
+
+
+def parallel_alpha_beta(game_state, rec_depth, deadline=None, chunks_per_worker=4):
+    """Root parallel alpha_beta on the process pool.
+
+    The best move of the previous search is searched first to get a good alpha (young brothers wait),
+    then the other root moves are spread over the workers, which share their best score as alpha.
+    The workers raise SearchTimeout at the deadline or as soon as STOP_SEARCH is set.
+    """
+    entry = TRANSPOSITION_TABLE.lookup(game_state.HASH)
+    best_move = entry.move if entry is not None else None
+    moves = list(move_ordering.ordered_moves(game_state, rec_depth, True, best_move, AI.alpha_beta.MOVE_ORDERING))
+    if not moves:
+        return -100, None
+
+    SHARED_ALPHA.value = -100
+    SHARED_STOP.clear()
+    generation = TRANSPOSITION_TABLE.generation
+    first = POOL.submit(_search_root_moves, game_state, moves[:1], rec_depth, deadline, generation, AI.alpha_beta.MOVE_ORDERING)
+    wait_for_workers([first])
+    results = [first.result()]
+
+    nb_chunks = min(len(moves) - 1, WORKERS*chunks_per_worker)
+    futures = [
+        POOL.submit(_search_root_moves, game_state, moves[1+i::nb_chunks], rec_depth, deadline, generation, AI.alpha_beta.MOVE_ORDERING)
+        for i in range(nb_chunks)
+    ]
+    wait_for_workers(futures)
+    results += [future.result() for future in futures]
+
+    score, move = max(results, key=lambda result: (result[1] is not None, result[0]))
+    if move is None:
+        move = moves[0]
+    TRANSPOSITION_TABLE.store(game_state.HASH, rec_depth, EXACT, score, move)
+    return score, move
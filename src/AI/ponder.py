@@ -0,0 +1,69 @@
+import threading
+from itertools import islice
+
+import AI.alpha_beta
+from AI.alpha_beta import alpha_beta, probable_outcomes, SearchTimeout, STOP_SEARCH, TRANSPOSITION_TABLE, MAX_DEPTH
+from AI.move_ordering import ordered_moves
+
+# Outcomes of our move and replies of the opponent considered when pondering
+PONDER_OUTCOMES = 2
+PONDER_REPLIES = 3
+
+
+class Ponderer:
+    """Search the positions expected after the reply of the opponent while the opponent thinks.
+
+    The searches fill the transposition table, and the results by position hash are given back by
+    stop so that the search of the actual position can start from them.
+    """
+
+    def __init__(self, nb_outcomes=PONDER_OUTCOMES, nb_replies=PONDER_REPLIES):
+        self.nb_outcomes = nb_outcomes
+        self.nb_replies = nb_replies
+        self.results = {}
+        self._thread = None
+
+    def start(self, game_state, move):
+        """Start pondering after we played move from game_state"""
+        self.stop()
+        self.results = {}
+        self._thread = threading.Thread(target=self._ponder, args=(game_state.copy(), move), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop pondering and return the (depth, score, move) searched by position hash"""
+        if self._thread is not None:
+            STOP_SEARCH.set()
+            self._thread.join()
+            STOP_SEARCH.clear()
+            self._thread = None
+        return self.results
+
+    def predicted_positions(self, game_state, move):
+        """Positions after the most probable outcomes of move and the most promising replies"""
+        positions = []
+        for _, changes in probable_outcomes(game_state.get_move_outcomes(move))[:self.nb_outcomes]:
+            undo_log = game_state.do_move(changes)
+            if game_state.TEAM_POSITIONS and game_state.ENEMY_POSITIONS:
+                entry = TRANSPOSITION_TABLE.lookup(game_state.HASH)
+                best_reply = entry.move if entry is not None else None
+                for reply in islice(ordered_moves(game_state, 1, False, best_reply, AI.alpha_beta.MOVE_ORDERING), self.nb_replies):
+                    _, reply_changes = max(game_state.get_move_outcomes(reply), key=lambda outcome: outcome[0])
+                    position = game_state.copy()
+                    position.do_move(reply_changes)
+                    positions.append(position)
+            game_state.undo_move(undo_log)
+        return positions
+
+    def _ponder(self, game_state, move):
+        positions = self.predicted_positions(game_state, move)
+        try:
+            for rec_depth in range(1, MAX_DEPTH+1):
+                for position in positions:
+                    if not position.TEAM_POSITIONS or not position.ENEMY_POSITIONS:
+                        continue
+                    score, best_move = alpha_beta(position, rec_depth)
+                    if best_move is not None:
+                        self.results[position.HASH] = (rec_depth, score, best_move)
+        except SearchTimeout:
+            pass
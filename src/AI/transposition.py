@@ -0,0 +1,64 @@
+from collections import namedtuple
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+TT_SIZE = 2**18
+
+TTEntry = namedtuple("TTEntry", ["key", "depth", "flag", "score", "move", "generation"])
+
+
+class TranspositionTable:
+    """Fixed size table of search results indexed by the Zobrist hash of the positions.
+
+    Each slot keeps a single entry. A new entry replaces the stored one if it is
+    for the same position, if the stored one comes from a previous search or if
+    it was searched at least as deep.
+    """
+
+    def __init__(self, size=TT_SIZE):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self.entries = [None]*self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        """Mark the start of a new turn, entries from previous turns become replaceable"""
+        self.generation += 1
+
+    def lookup(self, key):
+        entry = self.entries[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is not None and entry.key != key:
+            if entry.generation == self.generation and entry.depth > depth:
+                return
+            self.replacements += 1
+        self.entries[index] = TTEntry(key, depth, flag, score, move, self.generation)
+        self.stores += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits/lookups if lookups else 0,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "filled": sum(entry is not None for entry in self.entries),
+            "size": self.size,
+        }
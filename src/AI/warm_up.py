@@ -0,0 +1,38 @@
+from battle import precompute_battle_outcomes
+from AI.alpha_beta import iterative_deepening, SearchTimeout, TRANSPOSITION_TABLE, MAX_DEPTH
+from AI.parallel import parallel_alpha_beta
+from AI import move_ordering
+
+# Battles precomputed between groups of at most this number of units
+WARM_UP_MAX_UNITS = 40
+
+
+def warm_up(game_state, ai_mode, deadline):
+    """Fill the caches of the search from the initial position, before the first move is asked.
+
+    The battle tables, the summed-area table and the first calls of the search are paid for here
+    instead of in the time of the first move, then the initial position is searched until the
+    deadline. Returns the (depth, score, move) searched by position hash, like Ponderer.stop.
+    """
+    precompute_battle_outcomes(min(max(game_state.UNITS[1], game_state.UNITS[2]), WARM_UP_MAX_UNITS))
+    # builds the summed-area table of the MAP message
+    for i, j in game_state.TEAM_POSITIONS:
+        game_state.get_possible_directions(i, j)
+    if not game_state.TEAM_POSITIONS or not game_state.ENEMY_POSITIONS:
+        return {}
+
+    results = {}
+
+    def on_result(depth, score, move):
+        if move is not None:
+            results[game_state.HASH] = (depth, score, move)
+
+    TRANSPOSITION_TABLE.new_search()
+    move_ordering.new_search()
+    search = parallel_alpha_beta if ai_mode == "parallel_alpha_beta" else None
+    try:
+        iterative_deepening(game_state, deadline, MAX_DEPTH, search, on_result=on_result)
+    except SearchTimeout:
+        # stopped by STOP_SEARCH during the depth 1 search
+        pass
+    return results
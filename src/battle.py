@@ -0,0 +1,76 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+BATTLE_CACHE_SIZE = 4096
+
+# Outcomes of a battle less probable than this are dropped, 0 keeps all of them
+BATTLE_EPSILON = 0
+
+
+@lru_cache(maxsize=BATTLE_CACHE_SIZE)
+def _binomial_coefficients(n):
+    """C(n, k) for k in 0..n as a read-only float array, computed exactly with integers"""
+    coefficients = np.array([math.comb(n, k) for k in range(n+1)], dtype=np.float64)
+    coefficients.setflags(write=False)
+    return coefficients
+
+
+def _as_outcomes(probas, epsilon):
+    """(probability, number of survivors) pairs, without those below epsilon except the most probable one"""
+    probas = probas.tolist()
+    outcomes = tuple((proba,k) for k,proba in enumerate(probas) if proba >= epsilon)
+    if not outcomes:
+        k = int(np.argmax(probas))
+        outcomes = ((probas[k],k),)
+    return outcomes
+
+
+@lru_cache(maxsize=BATTLE_CACHE_SIZE)
+def _human_battle_outcomes(n_units, n_humans, epsilon):
+    p_win = n_units / (2 * n_humans)
+    n = n_units + n_humans
+    k = np.arange(n+1)
+    n_surv_with_proba = p_win*_binomial_coefficients(n)*p_win**k*(1-p_win)**(n-k)
+    k = np.arange(n_humans+1)
+    n_surv_human_with_proba = (1-p_win)*_binomial_coefficients(n_humans)*(1-p_win)**k*p_win**(n_humans-k)
+    return _as_outcomes(n_surv_with_proba,epsilon),_as_outcomes(n_surv_human_with_proba,epsilon)
+
+
+@lru_cache(maxsize=BATTLE_CACHE_SIZE)
+def _enemy_battle_outcomes(n_units, n_ennemies, epsilon):
+    if n_units <= n_ennemies:
+        p_win = n_units / (2 * n_ennemies)
+    else:
+        p_win = (n_units / n_ennemies) - 0.5
+    k = np.arange(n_units+1)
+    n_surv_team_with_proba = p_win*_binomial_coefficients(n_units)*(1-p_win)**k*p_win**(n_units-k)
+    k = np.arange(n_ennemies+1)
+    n_surv_ennemy_with_proba = (1-p_win)*_binomial_coefficients(n_ennemies)*(1-p_win)**k*p_win**(n_ennemies-k)
+    return _as_outcomes(n_surv_team_with_proba,epsilon),_as_outcomes(n_surv_ennemy_with_proba,epsilon)
+
+
+def human_battle_outcomes(n_units, n_humans):
+    """Survivors of n_units attacking n_humans, as (team wins, humans win) tuples of (probability, survivors)"""
+    return _human_battle_outcomes(int(n_units),int(n_humans),BATTLE_EPSILON)
+
+
+def enemy_battle_outcomes(n_units, n_ennemies):
+    """Survivors of n_units attacking n_ennemies, as (team wins, enemies win) tuples of (probability, survivors)"""
+    return _enemy_battle_outcomes(int(n_units),int(n_ennemies),BATTLE_EPSILON)
+
+
+def battle_cache_info():
+    return {
+        "human": _human_battle_outcomes.cache_info()._asdict(),
+        "enemy": _enemy_battle_outcomes.cache_info()._asdict(),
+    }
+
+
+def precompute_battle_outcomes(max_units):
+    """Fill the caches with the battles between groups of at most max_units units"""
+    for n_units in range(1, max_units+1):
+        # n_units attacking n_ennemies fight when neither group is 1.5 times bigger than the other
+        for n_ennemies in range(int(n_units/1.5)+1, min(math.ceil(1.5*n_units), max_units+1)):
+            enemy_battle_outcomes(n_units, n_ennemies)
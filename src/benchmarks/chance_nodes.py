@@ -0,0 +1,64 @@
+"""Nodes searched with and without the Star1/Star2 pruning of chance nodes, at several depths.
+
+Without the pruning, the outcomes are searched with the window of the chance node. The positions
+where the pruning searches more nodes are listed for each depth.
+
+Run from the src directory: python -m benchmarks.chance_nodes
+"""
+from argparse import ArgumentParser
+
+import AI.alpha_beta
+from AI import move_ordering
+from AI.alpha_beta import alpha_beta, TRANSPOSITION_TABLE
+from benchmarks.common import game_state_from_map, random_game_state, count_nodes
+
+# Battles between groups of close sizes, with humans around
+BATTLE_MAPS = [
+    ((5, 10), (4, 1), [(4, 1, 0, 8, 0), (6, 2, 0, 0, 7), (2, 3, 3, 0, 0), (8, 0, 4, 0, 0), (9, 4, 2, 0, 0)]),
+    ((6, 6), (1, 1), [(1, 1, 0, 6, 0), (3, 3, 0, 0, 5), (1, 4, 0, 0, 3), (4, 1, 0, 4, 0), (5, 5, 2, 0, 0)]),
+    ((8, 8), (2, 2), [(2, 2, 0, 9, 0), (4, 4, 0, 0, 8), (6, 1, 5, 0, 0), (1, 6, 4, 0, 0), (7, 7, 3, 0, 0)]),
+    ((10, 10), (3, 4), [(3, 4, 0, 5, 0), (4, 6, 0, 0, 4), (6, 6, 0, 5, 0), (5, 8, 0, 0, 6), (0, 0, 2, 0, 0)]),
+]
+
+
+def positions():
+    yield from (game_state_from_map(*battle_map) for battle_map in BATTLE_MAPS)
+    yield from (random_game_state(size, size, seed) for size, seed in ((10, 0), (20, 1), (20, 2)))
+
+
+def search_counts(depth):
+    """Nodes of each position and total time of the searches at depth"""
+    counts = []
+    total_elapsed = 0
+    for game_state in positions():
+        TRANSPOSITION_TABLE.clear()
+        move_ordering.KILLER_MOVES.clear()
+        move_ordering.HISTORY.clear()
+        _, nb_nodes, elapsed = count_nodes(alpha_beta, game_state, depth)
+        counts.append(nb_nodes)
+        total_elapsed += elapsed
+    return counts, total_elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--depths', default=[2, 3, 4], type=int, nargs='+', help='Search depths.')
+    args = parser.parse_args()
+
+    for depth in args.depths:
+        results = {}
+        for pruning in (False, True):
+            AI.alpha_beta.CHANCE_PRUNING = pruning
+            results[pruning] = search_counts(depth)
+            counts, total_elapsed = results[pruning]
+            print(f"depth {depth}, chance pruning {'on' if pruning else 'off'}: {sum(counts)} nodes in {total_elapsed:.2f}s {counts}")
+        regressions = [
+            f"position {index}: {off} -> {on}"
+            for index, (off, on) in enumerate(zip(results[False][0], results[True][0])) if on > off
+        ]
+        print(f"depth {depth}, more nodes with pruning: {', '.join(regressions) or 'none'}")
+    AI.alpha_beta.CHANCE_PRUNING = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import time
+
+import AI.alpha_beta
+from server import random_map
+from state import GameState
+
+
+def game_state_from_map(size, start, cells, state_class=GameState):
+    """Build a GameState as if the SET, HME and MAP messages had been received"""
+    game_state = state_class()
+    game_state.update_game_state(["set", list(size)])
+    game_state.update_game_state(["hme", list(start)])
+    game_state.update_game_state(["map", cells])
+    return game_state
+
+
+def random_game_state(n, m, seed, state_class=GameState, **kwargs):
+    return game_state_from_map(*random_map(n, m, seed, **kwargs), state_class=state_class)
+
+
+def count_nodes(search, *args, **kwargs):
+    """Run search, returning its result, the number of alpha_beta calls and the elapsed time"""
+    alpha_beta = AI.alpha_beta.alpha_beta
+    nb_nodes = 0
+
+    def counting_alpha_beta(*args, **kwargs):
+        nonlocal nb_nodes
+        nb_nodes += 1
+        return alpha_beta(*args, **kwargs)
+
+    AI.alpha_beta.alpha_beta = counting_alpha_beta
+    try:
+        start = time.perf_counter()
+        result = search(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    finally:
+        AI.alpha_beta.alpha_beta = alpha_beta
+    return result, nb_nodes, elapsed
@@ -0,0 +1,101 @@
+"""Fixed positions of the benchmark suite, serialized in positions.json.
+
+Each position is a board of the player to move: its size, team and occupied cells. The corpus is
+generated once with fixed seeds, so that the benchmark runs can be compared.
+
+Rebuild the corpus from the src directory: python -m benchmarks.corpus
+"""
+import json
+import os
+import random
+from argparse import ArgumentParser
+
+from AI import move_ordering
+from AI.alpha_beta import alpha_beta, TRANSPOSITION_TABLE
+from server import random_map
+from state import GameState
+from benchmarks.chance_nodes import BATTLE_MAPS
+from benchmarks.common import game_state_from_map
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "positions.json")
+CATEGORIES = ("opening", "midgame", "large", "battle")
+
+
+def serialize(game_state, name, category):
+    m, n = game_state.SIZE
+    cells = [[i, j, *game_state.get_cell(i, j)] for i, j in sorted(game_state.TEAM_POSITIONS | game_state.ENEMY_POSITIONS | game_state.HUMAN_POSITIONS)]
+    return {"name": name, "category": category, "size": [n, m], "team": game_state.TEAM, "cells": cells}
+
+
+def deserialize(position, state_class=GameState):
+    game_state = state_class()
+    game_state.update_game_state(["set", position["size"]])
+    game_state.TEAM = position["team"]
+    game_state.ENEMY_TEAM = 3 - position["team"]
+    game_state.update_board(position["cells"])
+    return game_state
+
+
+def self_play(game_state, nb_plies, seed, depth=2):
+    """Positions reached by alpha_beta playing both sides, the battles being drawn at random"""
+    generator = random.Random(seed)
+    positions = []
+    for _ in range(nb_plies):
+        if not game_state.TEAM_POSITIONS or not game_state.ENEMY_POSITIONS:
+            break
+        TRANSPOSITION_TABLE.clear()
+        move_ordering.KILLER_MOVES.clear()
+        move_ordering.HISTORY.clear()
+        _, move = alpha_beta(game_state, depth)
+        outcomes = game_state.get_move_outcomes(move)
+        _, changes = generator.choices(outcomes, weights=[proba for proba, _ in outcomes])[0]
+        game_state.do_move(changes)
+        positions.append(game_state.copy())
+    return positions
+
+
+def build_corpus():
+    corpus = []
+    for size, seed in ((10, 0), (10, 1), (20, 2), (30, 3)):
+        game_state = game_state_from_map(*random_map(size, size, seed))
+        corpus.append(serialize(game_state, f"opening_{size}x{size}_{seed}", "opening"))
+
+    # positions with several groups on each side, reached after a few moves
+    for size, seed in ((10, 4), (15, 5), (20, 6), (20, 7)):
+        game_state = game_state_from_map(*random_map(size, size, seed, nb_humans=10))
+        candidates = [
+            position for position in self_play(game_state, 16, seed)
+            if position.TEAM_POSITIONS and position.ENEMY_POSITIONS
+        ]
+        position = max(reversed(candidates), key=lambda position: len(position.TEAM_POSITIONS) + len(position.ENEMY_POSITIONS))
+        corpus.append(serialize(position, f"midgame_{size}x{size}_{seed}", "midgame"))
+
+    for size, seed, nb_humans in ((50, 8, 20), (100, 9, 40), (100, 10, 60)):
+        game_state = game_state_from_map(*random_map(size, size, seed, nb_humans=nb_humans))
+        corpus.append(serialize(game_state, f"large_{size}x{size}_{seed}", "large"))
+
+    for index, battle_map in enumerate(BATTLE_MAPS):
+        corpus.append(serialize(game_state_from_map(*battle_map), f"battle_{index}", "battle"))
+    return corpus
+
+
+def load_corpus(path=CORPUS_PATH, categories=CATEGORIES):
+    with open(path) as corpus_file:
+        return [position for position in json.load(corpus_file) if position["category"] in categories]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--output', default=CORPUS_PATH, help='File the corpus is written to.')
+    args = parser.parse_args()
+
+    corpus = build_corpus()
+    with open(args.output, "w") as corpus_file:
+        # one position per line
+        corpus_file.write("[\n" + ",\n".join(json.dumps(position) for position in corpus) + "\n]\n")
+    for category in CATEGORIES:
+        print(f"{category}: {sum(position['category'] == category for position in corpus)} positions")
+
+
+if __name__ == '__main__':
+    main()
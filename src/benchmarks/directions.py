@@ -0,0 +1,85 @@
+"""Speed of get_possible_directions with the summed-area table against the previous np.sum implementation.
+
+Both the rate of direction queries and the node rate of alpha_beta are reported. The summed-area
+table is maintained by update_board in both runs, only the queries differ.
+
+Run from the src directory: python -m benchmarks.directions
+"""
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+import AI.alpha_beta
+from state import GameState
+from benchmarks.common import random_game_state, count_nodes
+
+
+def get_possible_directions_with_sums(self, i, j):
+    """Previous implementation of GameState.get_possible_directions, slicing STATE for every query"""
+    directions = []
+    if np.sum(self.STATE[i+1:,j+1:,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i+1:,j+1:,0]) > np.sum(self.STATE[i+1:,j+1:,self.TEAM]):
+        directions.append((i+1,j+1))
+    if j>0 and (np.sum(self.STATE[i+1:,:j,self.ENEMY_TEAM]) >0 or np.sum(self.STATE[i+1:,:j,0]) > np.sum(self.STATE[i+1:,:j,self.TEAM])):
+        directions.append((i+1,j-1))
+    if np.sum(self.STATE[i+1:,j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i+1:,j,0]) > np.sum(self.STATE[i+1:,j,self.TEAM]):
+        directions.append((i+1,j))
+    if i>0 and (np.sum(self.STATE[:i,j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[:i,j,0]) > np.sum(self.STATE[:i,j,self.TEAM])):
+        directions.append((i-1,j))
+    if i>0 and (np.sum(self.STATE[:i,j+1:,self.ENEMY_TEAM])>0 or np.sum(self.STATE[:i,j+1:,0]) > np.sum(self.STATE[:i,j+1:,self.TEAM])):
+        directions.append((i-1,j+1))
+    if i>0 and j>0 and (np.sum(self.STATE[:i,:j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[:i,:j,0]) > np.sum(self.STATE[:i,:j,self.TEAM])):
+        directions.append((i-1,j-1))
+    if j>0 and (np.sum(self.STATE[i,:j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i,:j,0])> np.sum(self.STATE[i,:j,self.TEAM])):
+        directions.append((i,j-1))
+    if (np.sum(self.STATE[i,j+1:,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i,j+1:,0]) > np.sum(self.STATE[i,j+1:,self.TEAM])):
+        directions.append((i,j+1))
+    return directions
+
+
+def query_rate(game_state, get_possible_directions, repeat=200):
+    """Number of direction queries per second over all the groups of the board"""
+    groups = list(game_state.TEAM_POSITIONS | game_state.ENEMY_POSITIONS | game_state.HUMAN_POSITIONS)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for i, j in groups:
+            get_possible_directions(game_state, i, j)
+    return repeat*len(groups)/(time.perf_counter() - start)
+
+
+def node_rate(game_state, depth):
+    """Number of alpha_beta calls per second for a fixed depth search"""
+    AI.alpha_beta.TRANSPOSITION_TABLE.clear()
+    _, nb_nodes, elapsed = count_nodes(AI.alpha_beta.alpha_beta, game_state, depth)
+    return nb_nodes, nb_nodes/elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', default=[20, 50, 100], type=int, nargs='+', help='Sides of the square maps.')
+    parser.add_argument('--seeds', default=3, type=int, help='Number of random maps per size.')
+    parser.add_argument('--depth', default=3, type=int, help='Search depth.')
+    args = parser.parse_args()
+
+    with_sat = GameState.get_possible_directions
+    for size in args.sizes:
+        for seed in range(args.seeds):
+            game_state = random_game_state(size, size, seed)
+            for i, j in game_state.TEAM_POSITIONS | game_state.ENEMY_POSITIONS | game_state.HUMAN_POSITIONS:
+                assert with_sat(game_state, i, j) == get_possible_directions_with_sums(game_state, i, j)
+            queries_sums = query_rate(game_state, get_possible_directions_with_sums)
+            queries_sat = query_rate(game_state, with_sat)
+            GameState.get_possible_directions = get_possible_directions_with_sums
+            try:
+                nodes, rate_sums = node_rate(game_state, args.depth)
+            finally:
+                GameState.get_possible_directions = with_sat
+            _, rate_sat = node_rate(game_state, args.depth)
+            print(f"{size}x{size} seed {seed}: queries x{queries_sat/queries_sums:.2f} "
+                  f"({queries_sums:.0f}/s -> {queries_sat:.0f}/s), "
+                  f"depth {args.depth} search x{rate_sat/rate_sums:.2f} "
+                  f"({nodes} nodes, {rate_sums:.0f} nodes/s -> {rate_sat:.0f} nodes/s)")
+
+
+if __name__ == '__main__':
+    main()
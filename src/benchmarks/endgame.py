@@ -0,0 +1,61 @@
+"""Time to solve endgame positions exactly, and moves of the depth-limited search which differ.
+
+Run from the src directory: python -m benchmarks.endgame
+"""
+import random
+import time
+from argparse import ArgumentParser
+
+import AI.alpha_beta
+from AI import move_ordering
+from AI.alpha_beta import alpha_beta, TRANSPOSITION_TABLE, GAMMA
+from AI.endgame import solve_endgame, is_endgame, ENDGAME_CACHE, ENDGAME_MAX_SPREAD
+from benchmarks.common import game_state_from_map
+
+
+def random_endgame(seed, nb_groups=3, max_units=20):
+    """Map of 2 or 3 groups without humans, one group of each team at least"""
+    generator = random.Random(seed)
+    positions = generator.sample([(x, y) for x in range(ENDGAME_MAX_SPREAD) for y in range(ENDGAME_MAX_SPREAD)], nb_groups)
+    teams = [1, 2] + [generator.choice((1, 2)) for _ in positions[2:]]
+    cells = [(x, y, 0, *((generator.randint(2, max_units), 0) if team == 1 else (0, generator.randint(2, max_units)))) for (x, y), team in zip(positions, teams)]
+    return (ENDGAME_MAX_SPREAD, ENDGAME_MAX_SPREAD), positions[0], cells
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--positions', default=30, type=int, help='Number of random endgame positions.')
+    parser.add_argument('--depth', default=4, type=int, help='Depth of the search without the solver.')
+    args = parser.parse_args()
+
+    game_states = [game_state_from_map(*random_endgame(seed, 2 + seed % 2)) for seed in range(args.positions)]
+    game_states = [game_state for game_state in game_states if is_endgame(game_state)]
+
+    ENDGAME_CACHE.clear()
+    solved = []
+    start = time.perf_counter()
+    for game_state in game_states:
+        solved.append(solve_endgame(game_state, GAMMA))
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for game_state in game_states:
+        solve_endgame(game_state, GAMMA)
+    warm = time.perf_counter() - start
+    print(f"{len(game_states)} positions solved in {cold:.2f}s, {warm*1000:.1f}ms with the cache, {len(ENDGAME_CACHE)} cached positions")
+
+    AI.alpha_beta.ENDGAME_SOLVER = False
+    differences = 0
+    for game_state, result in zip(game_states, solved):
+        TRANSPOSITION_TABLE.clear()
+        move_ordering.KILLER_MOVES.clear()
+        move_ordering.HISTORY.clear()
+        _, move = alpha_beta(game_state, args.depth)
+        if result is not None and move != result[1]:
+            differences += 1
+            print(f"{sorted(move)} instead of {sorted(result[1])}, exact score {result[0]:.2f}")
+    AI.alpha_beta.ENDGAME_SOLVER = True
+    print(f"depth {args.depth} search without the solver: {differences} different moves out of {len(game_states)}")
+
+
+if __name__ == '__main__':
+    main()
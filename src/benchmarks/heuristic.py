@@ -0,0 +1,102 @@
+"""Speed of the leaf evaluation against the previous implementation summing STATE and looping over the groups.
+
+The positions are taken along random games, the new heuristic, scored one by one and by evaluate_many,
+must give exactly the same values as the previous one. The finished games are left out of the comparison:
+the previous implementation scored a lost game 0 and a game without any group 100, heuristic now scores
+them -100 and 0 like the endgame solver.
+
+Run from the src directory: python -m benchmarks.heuristic
+"""
+import random
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from AI.alpha_beta import heuristic, evaluate_many
+from benchmarks.common import random_game_state
+
+
+def distance_to_humans_with_loops(game_state):
+    """Previous implementation of distance_to_humans"""
+    total_score = 0
+    for (i,j) in game_state.HUMAN_POSITIONS:
+        n_human = game_state.STATE[i,j,0]
+        team_dists = []
+        enemy_dists = []
+        for i2,j2 in game_state.TEAM_POSITIONS:
+            if game_state.STATE[i2,j2,game_state.TEAM] >= n_human:
+                team_dists.append(max(np.abs(i2-i),np.abs(j2-j)))
+        for i2,j2 in game_state.ENEMY_POSITIONS:
+            if game_state.STATE[i2,j2,game_state.ENEMY_TEAM] >= n_human:
+                enemy_dists.append(max(np.abs(i2-i),np.abs(j2-j)))
+        if len(team_dists) > 0:
+            total_score += n_human/min(team_dists)
+        if len(enemy_dists) > 0:
+            total_score += n_human/min(enemy_dists)
+    return total_score
+
+
+def heuristic_with_sums(game_state):
+    """Previous implementation of heuristic"""
+    is_won = len(game_state.ENEMY_POSITIONS) == 0
+    if is_won: return 100
+    is_lost = len(game_state.TEAM_POSITIONS) == 0
+    if is_lost: return 0
+    COEFF_1 = 1
+    COEFF_2 = .2
+    units_diff = np.sum(game_state.STATE[:,:,game_state.TEAM]) - np.sum(game_state.STATE[:,:,game_state.ENEMY_TEAM])
+    heuristic_value = COEFF_1*units_diff + COEFF_2*distance_to_humans_with_loops(game_state)
+    return 100*np.tanh(heuristic_value/20)
+
+
+def random_game(size, seed, nb_humans, nb_moves):
+    """Positions reached by playing random moves from a random map"""
+    generator = random.Random(seed)
+    game_state = random_game_state(size, size, seed, nb_humans=nb_humans)
+    positions = []
+    for _ in range(nb_moves):
+        positions.append(game_state.copy())
+        moves = list(game_state.get_next_moves(True))
+        if not moves or not game_state.TEAM_POSITIONS or not game_state.ENEMY_POSITIONS:
+            break
+        _, changes = generator.choice(game_state.get_move_outcomes(generator.choice(moves)))
+        game_state.do_move(changes)
+    return positions
+
+
+def time_per_position(evaluate, positions, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        evaluate(positions)
+    return (time.perf_counter() - start)/repeat/len(positions)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', default=[10, 20, 50, 100], type=int, nargs='+', help='Sides of the square maps.')
+    parser.add_argument('--humans', default=[4, 8, 20, 40], type=int, nargs='+', help='Number of human groups of the maps of each size.')
+    parser.add_argument('--seeds', default=5, type=int, help='Number of random games per size.')
+    parser.add_argument('--moves', default=20, type=int, help='Number of random moves played in each game.')
+    parser.add_argument('--batch', default=16, type=int, help='Number of positions scored by each evaluate_many call.')
+    args = parser.parse_args()
+
+    for size, nb_humans in zip(args.sizes, args.humans):
+        positions = [position for seed in range(args.seeds) for position in random_game(size, seed, nb_humans, args.moves)]
+        scores = evaluate_many(positions)
+        for position, score in zip(positions, scores):
+            if position.TEAM_POSITIONS and position.ENEMY_POSITIONS:
+                assert heuristic(position) == heuristic_with_sums(position) == score
+            else:
+                assert heuristic(position) == score
+
+        batches = [positions[k:k+args.batch] for k in range(0, len(positions), args.batch)]
+        with_sums = time_per_position(lambda positions: [heuristic_with_sums(position) for position in positions], positions)
+        incremental = time_per_position(lambda positions: [heuristic(position) for position in positions], positions)
+        batched = time_per_position(lambda batches: [evaluate_many(batch) for batch in batches], batches)*len(batches)/len(positions)
+        print(f"{size}x{size} with {nb_humans} human groups: {1e6*with_sums:.1f}us -> {1e6*incremental:.1f}us "
+              f"(x{with_sums/incremental:.2f}), evaluate_many {1e6*batched:.1f}us (x{with_sums/batched:.2f}) per position")
+
+
+if __name__ == '__main__':
+    main()
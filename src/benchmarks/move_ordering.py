@@ -0,0 +1,42 @@
+"""Beta cuts happening on the first move searched, with and without the move ordering heuristics.
+
+Run from the src directory: python -m benchmarks.move_ordering
+"""
+from argparse import ArgumentParser
+
+import AI.alpha_beta
+from AI import move_ordering
+from AI.alpha_beta import alpha_beta, CUTOFF_STATS, TRANSPOSITION_TABLE
+from benchmarks.common import random_game_state, count_nodes
+
+POSITIONS = [(10, 10, 0), (20, 20, 1), (20, 20, 2), (30, 30, 1), (50, 50, 0)]
+
+
+def search_statistics(game_state, depth):
+    TRANSPOSITION_TABLE.clear()
+    move_ordering.KILLER_MOVES.clear()
+    move_ordering.HISTORY.clear()
+    CUTOFF_STATS.update(cutoffs=0, first_move_cutoffs=0)
+    _, nb_nodes, elapsed = count_nodes(alpha_beta, game_state, depth)
+    return nb_nodes, elapsed, CUTOFF_STATS["cutoffs"], CUTOFF_STATS["first_move_cutoffs"]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--depth', default=4, type=int, help='Search depth.')
+    args = parser.parse_args()
+
+    for ordering in (False, True):
+        AI.alpha_beta.MOVE_ORDERING = ordering
+        totals = [0, 0, 0, 0]
+        for position in POSITIONS:
+            statistics = search_statistics(random_game_state(*position), args.depth)
+            totals = [total + value for total, value in zip(totals, statistics)]
+        nb_nodes, elapsed, cutoffs, first_move_cutoffs = totals
+        print(f"move ordering {'on' if ordering else 'off'}: {nb_nodes} nodes in {elapsed:.2f}s, "
+              f"{cutoffs} beta cuts, {first_move_cutoffs/max(cutoffs, 1):.1%} on the first move")
+    AI.alpha_beta.MOVE_ORDERING = True
+
+
+if __name__ == '__main__':
+    main()
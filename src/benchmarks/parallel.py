@@ -0,0 +1,57 @@
+"""Speedup of the parallel_alpha_beta search over alpha_beta for 1, 2, 4 and 8 workers.
+
+Run from the src directory: python -m benchmarks.parallel
+
+The speedups have only been measured on a single CPU so far, where the workers share the core and
+the parallel search is slower than alpha_beta: results on a multi-core machine are still missing.
+
+Chance nodes average scores bounded by the search window, so the root score can differ slightly
+from the sequential one when the workers search with other windows.
+"""
+import os
+import time
+from argparse import ArgumentParser
+
+from AI.alpha_beta import alpha_beta, TRANSPOSITION_TABLE
+from AI.parallel import parallel_alpha_beta, start_pool, stop_pool
+from benchmarks.common import random_game_state
+
+POSITIONS = [(20, 20, 1), (20, 20, 2), (30, 30, 1), (50, 50, 0)]
+
+
+def timed_search(search, game_state, depth):
+    TRANSPOSITION_TABLE.clear()
+    start = time.perf_counter()
+    score, _ = search(game_state, depth)
+    return time.perf_counter() - start, score
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--workers', default=[1, 2, 4, 8], type=int, nargs='+', help='Pool sizes to measure.')
+    parser.add_argument('--depth', default=4, type=int, help='Search depth.')
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    game_states = [random_game_state(*position) for position in POSITIONS]
+    sequential = [timed_search(alpha_beta, game_state, args.depth) for game_state in game_states]
+    total_sequential = sum(elapsed for elapsed, _ in sequential)
+    print(f"alpha_beta: {total_sequential:.2f}s")
+
+    for workers in args.workers:
+        start_pool(workers)
+        # the first task of each worker pays for the process start
+        parallel_alpha_beta(game_states[0], 1)
+        total = 0
+        score_difference = 0
+        for game_state, (_, score) in zip(game_states, sequential):
+            elapsed, parallel_score = timed_search(parallel_alpha_beta, game_state, args.depth)
+            total += elapsed
+            score_difference = max(score_difference, abs(parallel_score - score))
+        stop_pool()
+        print(f"parallel_alpha_beta, {workers} workers: {total:.2f}s, speedup x{total_sequential/total:.2f}, "
+              f"root score difference {score_difference:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Memory and speed of the dense GameState against SparseGameState on maps of increasing size.
+
+For each size, the memory and the time of a copy, the time of apply_move and the node rate of a
+fixed depth search are reported for both representations, which must find the same move.
+
+Run from the src directory: python -m benchmarks.sparse_state
+"""
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from AI import move_ordering
+from AI.alpha_beta import alpha_beta, TRANSPOSITION_TABLE
+from state import GameState, SparseGameState
+from benchmarks.common import random_map, game_state_from_map, count_nodes
+
+
+def copy_memory(game_state, nb_copies=100):
+    """Bytes allocated by a copy of game_state"""
+    tracemalloc.start()
+    copies = [game_state.copy() for _ in range(nb_copies)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del copies
+    return size/nb_copies
+
+
+def time_per_call(function, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start)/repeat
+
+
+def search(game_state, depth):
+    TRANSPOSITION_TABLE.clear()
+    move_ordering.KILLER_MOVES.clear()
+    move_ordering.HISTORY.clear()
+    (score, move), nb_nodes, elapsed = count_nodes(alpha_beta, game_state, depth)
+    return move, nb_nodes/elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', default=[10, 20, 50, 100], type=int, nargs='+', help='Sides of the square maps.')
+    parser.add_argument('--seeds', default=3, type=int, help='Number of random maps per size.')
+    parser.add_argument('--depth', default=3, type=int, help='Search depth.')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        for seed in range(args.seeds):
+            game_map = random_map(size, size, seed)
+            results = {}
+            for state_class in (GameState, SparseGameState):
+                game_state = game_state_from_map(*game_map, state_class=state_class)
+                move = next(game_state.get_next_moves())
+                memory = copy_memory(game_state)
+                copy_time = time_per_call(game_state.copy)
+                apply_time = time_per_call(lambda: game_state.apply_move(move))
+                best_move, node_rate = search(game_state, args.depth)
+                results[state_class.__name__] = best_move
+                print(f"{size}x{size} seed {seed} {state_class.__name__}: copy {memory/1024:.1f}KiB in {1e6*copy_time:.1f}us, "
+                      f"apply_move {1e6*apply_time:.1f}us, depth {args.depth} search {node_rate:.0f} nodes/s")
+            assert results["GameState"] == results["SparseGameState"]
+
+
+if __name__ == '__main__':
+    main()
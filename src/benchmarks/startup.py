@@ -0,0 +1,89 @@
+"""Import time of the client and time to the first move, with and without the warm up.
+
+Each measure runs in a new Python process, so that the imports and the caches are cold. The first
+move is searched to a fixed depth after the MAP message, and with a deadline to compare the depth
+reached in the time of a move.
+
+Run from the src directory: python -m benchmarks.startup
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, SUPPRESS
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_first_move(size, seed, depth, timeout, warm):
+    """Run in a new process, the imports are timed here and not at the top of the module"""
+    start = time.perf_counter()
+    # the modules imported by the client
+    import main
+    import_time = time.perf_counter() - start
+
+    from AI.alpha_beta import alpha_beta, iterative_deepening
+    from AI.warm_up import warm_up
+    from benchmarks.common import random_game_state
+
+    game_state = random_game_state(size, size, seed)
+    warm_up_time = 0
+    known_result = None
+    if warm:
+        start = time.perf_counter()
+        known_result = warm_up(game_state, "alpha_beta", time.time() + timeout).get(game_state.HASH)
+        warm_up_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    alpha_beta(game_state, depth)
+    first_move_time = time.perf_counter() - start
+
+    depths = []
+    iterative_deepening(game_state, time.time() + timeout, known_result=known_result, on_result=lambda depth, score, move: depths.append(depth))
+    return {
+        "import_time": import_time,
+        "scipy_imported": "scipy" in sys.modules,
+        "warm_up_time": warm_up_time,
+        "first_move_time": first_move_time,
+        "depth_reached": depths[-1],
+    }
+
+
+def run_child(size, seed, depth, timeout, warm):
+    command = [sys.executable, "-m", "benchmarks.startup", "--child", "--size", str(size), "--seed", str(seed), "--depth", str(depth), "--timeout", str(timeout)]
+    if warm:
+        command.append("--warm")
+    output = subprocess.run(command, cwd=SRC_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--size', default=20, type=int, help='Rows and columns of the random map.')
+    parser.add_argument('--seed', default=0, type=int, help='Seed of the first random map, the next runs use the next seeds.')
+    parser.add_argument('--depth', default=3, type=int, help='Depth of the first move search.')
+    parser.add_argument('--timeout', default=1, type=float, help='Time of the warm up and of the first move search with a deadline.')
+    parser.add_argument('--runs', default=5, type=int, help='Processes started for each configuration.')
+    parser.add_argument('--child', action='store_true', help=SUPPRESS)
+    parser.add_argument('--warm', action='store_true', help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_first_move(args.size, args.seed, args.depth, args.timeout, args.warm)))
+        return
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    print(f"python startup: {1000*(time.perf_counter() - start):.0f}ms")
+    for warm in (False, True):
+        runs = [run_child(args.size, args.seed + run, args.depth, args.timeout, warm) for run in range(args.runs)]
+        median = lambda metric: statistics.median(run[metric] for run in runs)
+        print(f"{'warm up' if warm else 'cold'}: import {1000*median('import_time'):.0f}ms (scipy imported: {runs[0]['scipy_imported']}), "
+              f"warm up {1000*median('warm_up_time'):.0f}ms, first move at depth {args.depth} {1000*median('first_move_time'):.1f}ms, "
+              f"depth reached in {args.timeout}s: {median('depth_reached')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Search benchmark on the fixed positions of the corpus, for each engine mode.
+
+For each position the suite reports the nodes per second and the time to reach each depth of an
+iterative deepening search, the peak memory of the search, the branching factor and the time of
+get_next_moves and apply_move. The results are written as JSON, and can be compared with a previous
+run to flag the metrics that got worse by more than a threshold.
+
+Run from the src directory:
+python -m benchmarks.suite --output before.json
+python -m benchmarks.suite --output after.json --compare before.json
+"""
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import numpy as np
+
+from AI import move_ordering
+from AI.alpha_beta import alpha_beta, TRANSPOSITION_TABLE
+from AI.parallel import parallel_alpha_beta, start_pool, stop_pool
+from state import GameState, SparseGameState
+from benchmarks.common import count_nodes
+from benchmarks.corpus import load_corpus, deserialize, CATEGORIES
+
+# State class, search and whether the nodes are searched in this process and can be counted
+MODES = {
+    "alpha_beta": (GameState, alpha_beta, True),
+    "sparse": (SparseGameState, alpha_beta, True),
+    "parallel_alpha_beta": (GameState, parallel_alpha_beta, False),
+}
+
+# Metrics compared between runs, with True when a higher value is better
+COMPARED_METRICS = {
+    "nodes_per_second": True,
+    "time_to_depth": False,
+    "peak_memory": False,
+    "movegen_time": False,
+    "apply_move_time": False,
+}
+
+
+def reset_tables():
+    TRANSPOSITION_TABLE.clear()
+    move_ordering.KILLER_MOVES.clear()
+    move_ordering.HISTORY.clear()
+
+
+def iterative_search(search, game_state, depth):
+    """Search depth 1 to depth like iterative_deepening, returning the nodes and the time of each depth"""
+    reset_tables()
+    TRANSPOSITION_TABLE.new_search()
+    move_ordering.new_search()
+    depths = []
+    for rec_depth in range(1, depth + 1):
+        _, nb_nodes, elapsed = count_nodes(search, game_state, rec_depth)
+        depths.append((nb_nodes, elapsed))
+    return depths
+
+
+def peak_memory(search, game_state, depth):
+    """Peak memory allocated by the search, tables of the previous searches excluded"""
+    reset_tables()
+    tracemalloc.start()
+    try:
+        for rec_depth in range(1, depth + 1):
+            search(game_state, rec_depth)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def mean_time(function, arguments, repeat=3, number=5):
+    """Time of a call of function, on average over the arguments and at best over the repeats"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            for argument in arguments:
+                function(argument)
+        best = min(best, (time.perf_counter() - start)/number/max(len(arguments), 1))
+    return best
+
+
+def benchmark_position(position, mode, depth, repeat=3, memory=True):
+    state_class, search, counts_nodes = MODES[mode]
+    game_state = deserialize(position, state_class)
+    root_moves = list(game_state.get_next_moves(True))
+
+    # the searches explore the same nodes, the best time of each depth is kept
+    runs = [iterative_search(search, game_state, depth) for _ in range(repeat)]
+    depths = [(run[0][0], min(elapsed for _, elapsed in run)) for run in zip(*runs)]
+    time_to_depth = np.cumsum([elapsed for _, elapsed in depths]).tolist()
+    nodes = [nb_nodes for nb_nodes, _ in depths] if counts_nodes else None
+    result = {
+        "time_to_depth": time_to_depth[-1],
+        "time_to_each_depth": time_to_depth,
+        "nodes": nodes,
+        "nodes_per_second": sum(nodes)/time_to_depth[-1] if counts_nodes else None,
+        # nodes of the last depth for each node of the previous one
+        "branching_factor": nodes[-1]/nodes[-2] if counts_nodes and depth > 1 and nodes[-2] else None,
+        "root_moves": len(root_moves),
+        "movegen_time": mean_time(lambda _: list(game_state.get_next_moves(True)), [None]),
+        "apply_move_time": mean_time(game_state.apply_move, root_moves[:20]),
+        "peak_memory": peak_memory(search, game_state, depth) if memory and counts_nodes else None,
+    }
+    return result
+
+
+def total(positions):
+    """Metrics of a mode over all the positions, less noisy than those of the small positions"""
+    time_to_depth = sum(metrics["time_to_depth"] for metrics in positions.values())
+    counted = all(metrics["nodes"] is not None for metrics in positions.values())
+    nodes = [sum(metrics["nodes"]) for metrics in positions.values()] if counted else None
+    return {
+        "time_to_depth": time_to_depth,
+        "nodes": nodes,
+        "nodes_per_second": sum(nodes)/time_to_depth if counted else None,
+    }
+
+
+def compare(baseline, results, threshold):
+    """Metrics of results worse than in baseline by more than threshold, as messages"""
+    regressions = []
+    for mode, positions in results["modes"].items():
+        for name, metrics in [*positions.items(), ("total", results["totals"][mode])]:
+            previous = baseline["totals"].get(mode) if name == "total" else baseline["modes"].get(mode, {}).get(name)
+            if previous is None:
+                continue
+            if previous["nodes"] is not None and metrics["nodes"] is not None and previous["nodes"] != metrics["nodes"]:
+                print(f"{mode} {name}: the search explored other nodes ({sum(previous['nodes'])} -> {sum(metrics['nodes'])})")
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                before, after = previous.get(metric), metrics.get(metric)
+                if not before or after is None:
+                    continue
+                change = after/before - 1
+                if (-change if higher_is_better else change) > threshold:
+                    regressions.append(f"{mode} {name}: {metric} {before:.6g} -> {after:.6g} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--depth', default=3, type=int, help='Depth of the iterative deepening searches.')
+    parser.add_argument('--modes', default=["alpha_beta", "sparse"], choices=list(MODES), nargs='+', help='Engine modes to measure.')
+    parser.add_argument('--categories', default=list(CATEGORIES), choices=CATEGORIES, nargs='+', help='Categories of positions of the corpus.')
+    parser.add_argument('--workers', default=os.cpu_count(), type=int, help='Number of processes of the parallel_alpha_beta mode.')
+    parser.add_argument('--repeat', default=3, type=int, help='Runs of each search, the best time is kept.')
+    parser.add_argument('--no-memory', action='store_true', help='Do not measure the peak memory, which runs each search again.')
+    parser.add_argument('--output', help='JSON file the results are written to.')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare the results with.')
+    parser.add_argument('--threshold', default=0.2, type=float, help='Relative change of a metric flagged as a regression.')
+    args = parser.parse_args()
+
+    corpus = load_corpus(categories=args.categories)
+    results = {
+        "meta": {
+            "depth": args.depth,
+            "repeat": args.repeat,
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "modes": {},
+        "totals": {},
+    }
+    for mode in args.modes:
+        if mode == "parallel_alpha_beta":
+            start_pool(args.workers)
+        positions = results["modes"][mode] = {}
+        for position in corpus:
+            metrics = positions[position["name"]] = benchmark_position(position, mode, args.depth, args.repeat, not args.no_memory)
+            nodes = f", {metrics['nodes_per_second']:.0f} nodes/s" if metrics["nodes_per_second"] else ""
+            if metrics["branching_factor"]:
+                nodes += f", branching factor {metrics['branching_factor']:.1f}"
+            print(f"{mode} {position['name']}: depth {args.depth} in {metrics['time_to_depth']:.3f}s{nodes}, {metrics['root_moves']} root moves")
+        if mode == "parallel_alpha_beta":
+            stop_pool()
+        totals = results["totals"][mode] = total(positions)
+        nodes_per_second = f", {totals['nodes_per_second']:.0f} nodes/s" if totals["nodes_per_second"] else ""
+        print(f"{mode}: {totals['time_to_depth']:.3f}s{nodes_per_second}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=1)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), results, args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Fill an opening book with deep searches of the first positions of random maps.
+
+From the start of each map, the position is searched to a fixed depth and the best move is played
+with its most probable outcome, the next position being the other team to move. The searches of
+the maps are run in parallel, and the results are merged into the book file used by main.py --book.
+
+Run from the src directory, for example:
+python build_book.py book.npy --size 10 10 --maps 20 --plies 6 --depth 5
+"""
+import os
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from AI import move_ordering
+from AI.alpha_beta import alpha_beta, TRANSPOSITION_TABLE
+from AI.opening_book import OpeningBook, BOOK_MIN_DEPTH
+from server import random_map
+from benchmarks.common import game_state_from_map
+
+
+def search_line(size, seed, nb_plies, depth):
+    """(position, depth, score, move) of the first nb_plies positions of the line played from a random map"""
+    game_state = game_state_from_map(*random_map(*size, seed))
+    results = []
+    for _ in range(nb_plies):
+        if not game_state.TEAM_POSITIONS or not game_state.ENEMY_POSITIONS:
+            break
+        TRANSPOSITION_TABLE.clear()
+        move_ordering.KILLER_MOVES.clear()
+        move_ordering.HISTORY.clear()
+        TRANSPOSITION_TABLE.new_search()
+        move_ordering.new_search()
+        # the shallower searches order the moves of the deeper ones, as in a game
+        for rec_depth in range(1, depth + 1):
+            score, move = alpha_beta(game_state, rec_depth)
+        results.append((game_state.copy(), depth, score, move))
+        _, changes = max(game_state.get_move_outcomes(move), key=lambda outcome: outcome[0])
+        game_state.do_move(changes)
+    return results
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument(dest='path', help='Book file, created if it does not exist.')
+    parser.add_argument('--size', default=[10, 10], type=int, nargs=2, help='Rows and columns of the random maps.')
+    parser.add_argument('--maps', default=10, type=int, help='Number of random maps.')
+    parser.add_argument('--first-seed', default=0, type=int, help='Seed of the first map, the next maps have the next seeds.')
+    parser.add_argument('--plies', default=4, type=int, help='Positions searched along the line of each map, both teams alternating.')
+    parser.add_argument('--depth', default=5, type=int, help='Depth of the searches, at least the depth kept by the book.')
+    parser.add_argument('--workers', default=os.cpu_count(), type=int, help='Maps searched at the same time.')
+    args = parser.parse_args()
+    if args.depth < BOOK_MIN_DEPTH:
+        parser.error(f'the book only keeps the searches of depth {BOOK_MIN_DEPTH} or more')
+
+    book = OpeningBook(args.path)
+    nb_entries = len(book)
+    seeds = range(args.first_seed, args.first_seed + args.maps)
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(search_line, tuple(args.size), seed, args.plies, args.depth) for seed in seeds]
+        for seed, future in zip(seeds, futures):
+            for game_state, depth, score, move in future.result():
+                book.store(game_state, depth, score, move)
+            print(f"map {seed}: {len(book) - nb_entries} new positions")
+    book.save()
+    print(f"{args.path}: {len(book)} positions")
+
+
+if __name__ == '__main__':
+    main()
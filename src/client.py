@@ -1,9 +1,16 @@
+import asyncio
+import select
 import socket
+import struct
 from typing import List
 import time
+import numpy as np
 #from src import config
 import config
 
+# Size of the chunks read from the socket
+RECV_SIZE = 4096
+
 
 class EndException(Exception):
     pass
@@ -21,12 +28,61 @@ def bytes_to_int(data: bytes) -> int:
     return int.from_bytes(data, "little")
 
 
+def decode_changes(data: bytes, nb: int) -> np.ndarray:
+    """Decode the nb cells (x, y, humans, vampires, werewolves) of a MAP or UPD message in one pass"""
+    return np.frombuffer(data, dtype=np.uint8, count=5*nb).reshape(nb, 5).astype(np.int64)
+
+
+# Size of the items of the commands sending a list, the other commands have a 2 bytes payload
+ITEM_SIZES = {"HUM": 2, "MAP": 5, "UPD": 5}
+
+
+def check_command(command: str):
+    if command == "END":
+        raise EndException()
+    if command == "BYE":
+        raise ByeException()
+    elif command not in ["SET", "HUM", "HME", "MAP", "UPD"]:
+        raise ValueError("Command unknown")
+
+
+def decode_message(command: str, payload: bytes) -> List:
+    """Message given to GameState.update_game_state from the payload of a command, without the number of items"""
+    if command == "SET":
+        return ["set", list(payload)]
+
+    if command == "HUM":
+        humans = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 2)
+        return ["hum", humans.tolist()]
+
+    if command == "HME":
+        return ["hme", list(payload)]
+
+    if command == "MAP":
+        return ["map", decode_changes(payload, len(payload)//5)]
+
+    if command == "UPD":
+        return ["upd", decode_changes(payload, len(payload)//5)]
+
+
+def encode_nme(name: str) -> bytes:
+    encoded_name = name.encode()
+    return struct.pack(f"3sB{len(encoded_name)}s", b"NME", len(encoded_name), encoded_name)
+
+
+def encode_mov(nb_moves: int, moves) -> bytes:
+    return struct.pack(f"3sB{5*len(moves)}B", b"MOV", nb_moves, *(data for move in moves for data in move))
+
+
 class ClientSocket:
     def __init__(self, ip: str = config.SERVER_IP, port: int = config.SERVER_PORT):
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._ip = ip
         self._port = port
         self._connected = False
+        # bytes received and not parsed yet, filled through a reusable chunk
+        self._buffer = bytearray()
+        self._chunk = memoryview(bytearray(RECV_SIZE))
         self.connect_to_server(self._ip, self._port)
         print(f"socket: {self._socket}")
 
@@ -36,59 +92,35 @@ class ClientSocket:
             self._socket.connect((ip, port))
             self._connected = True
 
-    def _get_command(self) -> str:
+    def _read(self, length: int) -> bytes:
         if not self._connected:
             self.connect_to_server(self._ip, self._port)
-        data = bytes()
-        while len(data) < 3:
-            data += self._socket.recv(3 - len(data))
-        return data.decode()
+        while len(self._buffer) < length:
+            nb_received = self._socket.recv_into(self._chunk)
+            if nb_received == 0:
+                raise ConnectionError("connection closed by the server")
+            self._buffer += self._chunk[:nb_received]
+        data = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        return data
+
+    def has_pending_data(self) -> bool:
+        """Whether a message has started arriving and can be read without waiting"""
+        return bool(self._buffer) or bool(select.select([self._socket], [], [], 0)[0])
+
+    def _get_command(self) -> str:
+        return self._read(3).decode()
 
     def _get_message(self, length: int) -> int:
-        if not self._connected:
-            self.connect_to_server(self._ip, self._port)
-        data: bytes = bytes()
-        while len(data) < length:
-            data += self._socket.recv(1 - len(data))
-        return bytes_to_int(data)
+        return bytes_to_int(self._read(length))
 
     def _parse_message(self) -> List:
         command: str = self._get_command()
-        if command == "END":
-            raise EndException()
-        if command == "BYE":
-            raise ByeException()
-        elif command not in ["SET", "HUM", "HME", "MAP", "UPD"]:
-            raise ValueError("Command unknown")
-
-        if command == "SET":
-            return ["set", [self._get_message(1), self._get_message(1)]]
-
-        if command == "HUM":
-            humans = []
-            nb = self._get_message(1)
-            for i in range(nb):
-                humans.append([self._get_message(1), self._get_message(1)])
-            return ["hum", humans]
-
-        if command == "HME":
-            return ["hme", [self._get_message(1), self._get_message(1)]]
-
-        if command == "MAP":
-            map = []
-            nb = self._get_message(1)
-            for i in range(nb):
-                map.append((self._get_message(1), self._get_message(1), self._get_message(1), self._get_message(1),
-                            self._get_message(1)))
-            return ["map", map]
-
-        if command == "UPD":
-            upd = []
+        check_command(command)
+        if command in ITEM_SIZES:
             nb = self._get_message(1)
-            for i in range(nb):
-                upd.append((self._get_message(1), self._get_message(1), self._get_message(1), self._get_message(1),
-                            self._get_message(1)))
-            return ["upd", upd]
+            return decode_message(command, self._read(ITEM_SIZES[command]*nb))
+        return decode_message(command, self._read(2))
 
     def get_message(self) -> List:
         try:
@@ -107,13 +139,49 @@ class ClientSocket:
             print("trying to connect to server")
             self.connect_to_server(self._ip, self._port)
 
-        self._socket.send("NME".encode() + bytes([len(name)]) + name.encode())
+        self._socket.sendall(encode_nme(name))
 
     def send_mov(self, nb_moves: int, moves):
+        self._socket.sendall(encode_mov(nb_moves, moves))
+
+
+class AsyncClientSocket:
+    """Same protocol as ClientSocket on asyncio streams, so that the game loop can wait for the server and the search together"""
 
-        message = bytes([nb_moves])
-        for move in moves:
-            for data in move:
-                message += bytes([data])
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
 
-        self._socket.send("MOV".encode() + message)
+    @classmethod
+    async def connect(cls, ip: str = config.SERVER_IP, port: int = config.SERVER_PORT):
+        reader, writer = await asyncio.open_connection(ip, port)
+        return cls(reader, writer)
+
+    async def _parse_message(self) -> List:
+        command: str = (await self._reader.readexactly(3)).decode()
+        check_command(command)
+        if command in ITEM_SIZES:
+            nb = bytes_to_int(await self._reader.readexactly(1))
+            return decode_message(command, await self._reader.readexactly(ITEM_SIZES[command]*nb))
+        return decode_message(command, await self._reader.readexactly(2))
+
+    async def get_message(self) -> List:
+        try:
+            return await self._parse_message()
+        except (OSError, asyncio.IncompleteReadError):
+            return None
+
+    async def send_nme(self, name: str):
+        self._writer.write(encode_nme(name))
+        await self._writer.drain()
+
+    async def send_mov(self, nb_moves: int, moves):
+        self._writer.write(encode_mov(nb_moves, moves))
+        await self._writer.drain()
+
+    async def close(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
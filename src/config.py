@@ -1,2 +1,5 @@
 SERVER_IP="localhost"
-SERVER_PORT=5555
\ No newline at end of file
+SERVER_PORT=5555
+MOVE_TIMEOUT=2.0
+TIMEOUT_MARGIN=0.3
+WARM_UP_TIME=0.5
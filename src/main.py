@@ -1,14 +1,28 @@
+import asyncio
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from client import ClientSocket
+import battle
+import config
+from client import ClientSocket, AsyncClientSocket, EndException, ByeException
 from argparse import ArgumentParser
 
-from state import GameState
-from AI.compute_next_move import compute_next_move
+from state import GameState, SparseGameState
+from AI.alpha_beta import SearchTimeout, STOP_SEARCH
+from AI.compute_next_move import compute_next_move, fallback_move, format_moves_for_response, parse_moves_from_response
+from AI.instrumentation import SearchTracer
+from AI.opening_book import OpeningBook
+from AI.parallel import start_pool
+from AI.ponder import Ponderer
+from AI.warm_up import warm_up
 
 
 def play_game(args):
-    game_state = GameState()
+    battle.BATTLE_EPSILON = args.battle_epsilon
+    if args.ai_mode in ("parallel_alpha_beta", "parallel_mcts"):
+        start_pool(args.workers)
+    game_state = SparseGameState() if args.sparse else GameState()
     client_socket = ClientSocket(args.ip, args.port)
     client_socket.send_nme("IA du groupe")
     # set message
@@ -25,14 +39,152 @@ def play_game(args):
     game_state.update_game_state(message)
     
     # start of the game
-    ai_mode = "alpha_beta"
+    ai_mode = args.ai_mode
+    warm_up_start = time.time()
+    warmed_up = {} if args.no_warm_up else warm_up(game_state, ai_mode, warm_up_start + config.WARM_UP_TIME)
+    # the first UPD may have been received during the warm up, its time counts from the start of the warm up
+    first_message_time = warm_up_start if client_socket.has_pending_data() else None
+    ponderer = Ponderer() if args.ponder else None
+    tracer = SearchTracer(args.trace_file, ai_mode) if args.trace_file else None
+    if tracer:
+        tracer.enable()
+    book = OpeningBook(args.book) if args.book else None
     while True:
-        message  = client_socket.get_message()
-        time_message_received = time.time()
+        try:
+            message  = client_socket.get_message()
+        except (EndException, ByeException):
+            if ponderer:
+                ponderer.stop()
+            if tracer:
+                tracer.close()
+            if book:
+                book.save()
+            return
+        time_message_received = first_message_time or time.time()
+        first_message_time = None
+        pondered = {**warmed_up, **(ponderer.stop() if ponderer else {})}
+        warmed_up = {}
         game_state.update_game_state(message)
         if message[0] == "upd":
-            nb_moves, moves = compute_next_move(game_state, ai_mode)
+            deadline = time_message_received + args.timeout - config.TIMEOUT_MARGIN
+            known_result = pondered.get(game_state.HASH)
+            if tracer:
+                tracer.new_turn()
+            nb_moves, moves = compute_next_move(game_state, ai_mode, deadline, known_result, tracer.on_result if tracer else None, book)
             client_socket.send_mov(nb_moves, moves)
+            if tracer:
+                tracer.end_turn(moves=moves, pondered=known_result is not None)
+            if ponderer:
+                ponderer.start(game_state, parse_moves_from_response(moves))
+
+
+async def play_turn(client_socket, executor, game_state, ai_mode, deadline, known_result, next_message, tracer=None, book=None):
+    """Search in the executor and send the best move found when the search ends or at the deadline.
+
+    The search is stopped without sending anything if next_message is received first, which means
+    that the game has ended. A search which fails is reported and the best move found so far is
+    sent. Returns the move sent.
+    """
+    # sent if the deadline is reached before the end of the depth 1 search
+    best = {"move": fallback_move(game_state)}
+
+    def on_result(depth, score, move):
+        if move is not None:
+            best["move"] = move
+        if tracer:
+            tracer.on_result(depth, score, move)
+
+    if tracer:
+        tracer.new_turn()
+
+    loop = asyncio.get_running_loop()
+    search = loop.run_in_executor(executor, compute_next_move, game_state.copy(), ai_mode, deadline, known_result, on_result, book)
+    await asyncio.wait([search, next_message], timeout=max(deadline - time.time(), 0), return_when=asyncio.FIRST_COMPLETED)
+    if search.done() and search.exception() is None:
+        # also the results of the book or of the pondering returned without calling on_result
+        best["move"] = parse_moves_from_response(search.result()[1])
+    move = None if next_message.done() else best["move"]
+    if move is not None:
+        moves = format_moves_for_response(move)
+        await client_socket.send_mov(len(moves), moves)
+    if not search.done():
+        STOP_SEARCH.set()
+    try:
+        await search
+    except SearchTimeout:
+        pass
+    except Exception as exception:
+        print(f"search failed: {exception!r}")
+    finally:
+        STOP_SEARCH.clear()
+    if tracer:
+        tracer.end_turn(moves=format_moves_for_response(move) if move is not None else None, pondered=known_result is not None)
+    return move
+
+
+async def play_game_async(args):
+    battle.BATTLE_EPSILON = args.battle_epsilon
+    if args.ai_mode in ("parallel_alpha_beta", "parallel_mcts"):
+        start_pool(args.workers)
+    game_state = SparseGameState() if args.sparse else GameState()
+    client_socket = await AsyncClientSocket.connect(args.ip, args.port)
+    await client_socket.send_nme("IA du groupe")
+    # set, hum, hme and map messages
+    for _ in range(4):
+        message = await client_socket.get_message()
+        game_state.update_game_state(message)
+
+    # start of the game
+    ai_mode = args.ai_mode
+    ponderer = Ponderer() if args.ponder else None
+    tracer = SearchTracer(args.trace_file, ai_mode) if args.trace_file else None
+    if tracer:
+        tracer.enable()
+    book = OpeningBook(args.book) if args.book else None
+    executor = ThreadPoolExecutor(1)
+    # the next message is always awaited, so that the end of the game interrupts the search
+    next_message = asyncio.ensure_future(client_socket.get_message())
+    warmed_up = {}
+    first_message_time = None
+    if not args.no_warm_up:
+        # the warm up runs until the first message, which is received on time
+        warming_up = asyncio.get_running_loop().run_in_executor(executor, warm_up, game_state.copy(), ai_mode, time.time() + config.WARM_UP_TIME)
+        await asyncio.wait([warming_up, next_message], return_when=asyncio.FIRST_COMPLETED)
+        first_message_time = time.time() if next_message.done() else None
+        STOP_SEARCH.set()
+        try:
+            warmed_up = await warming_up
+        finally:
+            STOP_SEARCH.clear()
+    try:
+        while True:
+            message = await next_message
+            time_message_received = first_message_time or time.time()
+            first_message_time = None
+            if message is None:
+                break
+            next_message = asyncio.ensure_future(client_socket.get_message())
+            pondered = {**warmed_up, **(ponderer.stop() if ponderer else {})}
+            warmed_up = {}
+            game_state.update_game_state(message)
+            if message[0] == "upd":
+                deadline = time_message_received + args.timeout - config.TIMEOUT_MARGIN
+                known_result = pondered.get(game_state.HASH)
+                move = await play_turn(client_socket, executor, game_state, ai_mode, deadline, known_result, next_message, tracer, book)
+                if ponderer and move is not None:
+                    ponderer.start(game_state, move)
+    except (EndException, ByeException):
+        pass
+    finally:
+        next_message.cancel()
+        if ponderer:
+            ponderer.stop()
+        executor.shutdown()
+        if tracer:
+            tracer.close()
+        if book:
+            book.save()
+        await client_socket.close()
 
 
 if __name__ == '__main__':
@@ -40,7 +192,20 @@ if __name__ == '__main__':
 
     parser.add_argument(dest='ip', default='localhost', type=str, help='IP adress the connection should be made to.')
     parser.add_argument(dest='port', default='5555', type=int, help='Chosen port for the connection.')
+    parser.add_argument('--ai-mode', default='alpha_beta', choices=['alpha_beta', 'parallel_alpha_beta', 'mcts', 'parallel_mcts'], help='Search used to choose the moves.')
+    parser.add_argument('--workers', default=os.cpu_count(), type=int, help='Number of processes of the parallel_alpha_beta and parallel_mcts searches.')
+    parser.add_argument('--battle-epsilon', default=battle.BATTLE_EPSILON, type=float, help='Battle outcomes less probable than this are not searched.')
+    parser.add_argument('--ponder', action='store_true', help='Search the expected positions while the opponent plays.')
+    parser.add_argument('--timeout', default=config.MOVE_TIMEOUT, type=float, help='Time allowed by the server for each move, in seconds.')
+    parser.add_argument('--sparse', action='store_true', help='Keep only the occupied cells of the board, for the large maps.')
+    parser.add_argument('--trace-file', help='Append the statistics of the search of each turn to this file, as one JSON line per turn.')
+    parser.add_argument('--book', help='Opening book file: the positions searched in previous games are deepened, and the results of the games are added to it.')
+    parser.add_argument('--no-warm-up', action='store_true', help='Do not fill the caches and search the initial position before the first move.')
+    parser.add_argument('--asyncio', action='store_true', help='Run the search in a thread and send the best move found at the deadline, the end of the game stops the search.')
 
     args = parser.parse_args()
     
-    play_game(args)
+    if args.asyncio:
+        asyncio.run(play_game_async(args))
+    else:
+        play_game(args)
@@ -0,0 +1,208 @@
+import random
+import socket
+import struct
+import time
+from argparse import ArgumentParser
+
+import config
+from state import GameState
+
+# Moves played by both players before the game is stopped, the team with the most units wins
+MAX_TURNS = 200
+
+
+def random_map(n, m, seed, nb_humans=8, nb_units=10, max_humans=6):
+    """Random map of n rows and m columns, returned as (size, start, cells) like the server messages"""
+    generator = random.Random(seed)
+    positions = generator.sample([(x, y) for x in range(m) for y in range(n)], nb_humans + 2)
+    team, enemy = positions[:2]
+    cells = [(*team, 0, nb_units, 0), (*enemy, 0, 0, nb_units)]
+    cells += [(x, y, generator.randint(1, max_humans), 0, 0) for x, y in positions[2:]]
+    return (n, m), team, cells
+
+
+def encode_cells(command: bytes, cells) -> bytes:
+    return struct.pack(f"3sB{5*len(cells)}B", command, len(cells), *(data for cell in cells for data in cell))
+
+
+class Player:
+    def __init__(self, connection: socket.socket, team: int):
+        self.connection = connection
+        self.file = connection.makefile("rb")
+        self.team = team
+        self.name = None
+        # cells changed since the last UPD sent to the player
+        self.pending_changes = {}
+        self.latencies = []
+        self.timeouts = 0
+        self.illegal_moves = 0
+
+    def read(self, length: int) -> bytes:
+        data = self.file.read(length)
+        if len(data) < length:
+            raise ConnectionError("connection closed by the player")
+        return data
+
+    def read_name(self):
+        command, length = struct.unpack("3sB", self.read(4))
+        if command != b"NME":
+            raise ValueError("NME expected")
+        self.name = self.read(length).decode()
+
+    def read_move(self):
+        command, nb_moves = struct.unpack("3sB", self.read(4))
+        if command != b"MOV":
+            raise ValueError("MOV expected")
+        data = self.read(5*nb_moves)
+        return frozenset(((data[k], data[k+1]), data[k+2], (data[k+3], data[k+4])) for k in range(0, 5*nb_moves, 5))
+
+    def send(self, data: bytes):
+        self.connection.sendall(data)
+
+    def close(self):
+        self.file.close()
+        self.connection.close()
+
+
+class LocalServer:
+    """Game server speaking the protocol of ClientSocket, for two players on the local machine.
+
+    The players are vampires (team 1, moving first) and werewolves (team 2) in their order of connection.
+    Battles are resolved by drawing one of the outcomes of GameState.get_move_outcomes, as the AI expects.
+    A player loses when it has no units left, plays an illegal move or does not answer in time.
+    """
+
+    def __init__(self, game_map, port=0, timeout=config.MOVE_TIMEOUT, max_turns=MAX_TURNS, seed=None):
+        self.game_map = game_map
+        self.timeout = timeout
+        self.max_turns = max_turns
+        self.random = random.Random(seed)
+        self.players = []
+        self.listener = socket.create_server(("127.0.0.1", port))
+        self.port = self.listener.getsockname()[1]
+
+    def accept_player(self):
+        connection, _ = self.listener.accept()
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        player = Player(connection, len(self.players) + 1)
+        player.read_name()
+        self.players.append(player)
+        return player
+
+    def close(self):
+        for player in self.players:
+            player.close()
+        self.listener.close()
+
+    def _send_map(self):
+        (n, m), _, cells = self.game_map
+        humans = [(x, y) for x, y, n_humans, _, _ in cells if n_humans > 0]
+        for player in self.players:
+            start = next((x, y) for x, y, _, *units in cells if units[player.team-1] > 0)
+            player.send(struct.pack("3sBB", b"SET", n, m))
+            player.send(struct.pack(f"3sB{2*len(humans)}B", b"HUM", len(humans), *(data for human in humans for data in human)))
+            player.send(struct.pack("3sBB", b"HME", *start))
+            player.send(encode_cells(b"MAP", cells))
+
+    def is_legal_move(self, game_state, move):
+        width, height = game_state.SIZE
+        sources = {source for source, _, _ in move}
+        if not move or sources & {destination for _, _, destination in move}:
+            return False
+        sent = {}
+        for (x, y), n_units, (x2, y2) in move:
+            if n_units <= 0 or max(abs(x2-x), abs(y2-y)) != 1 or not (0 <= x2 < width and 0 <= y2 < height):
+                return False
+            sent[(x, y)] = sent.get((x, y), 0) + n_units
+        return all(game_state.get_units(x, y, game_state.TEAM) >= n_units for (x, y), n_units in sent.items())
+
+    def _play_turn(self, game_state, player):
+        """Send the changes to the player and apply its move, returns False if the player has lost"""
+        changes = [(x, y, *content) for (x, y), content in player.pending_changes.items()]
+        player.pending_changes = {}
+        player.send(encode_cells(b"UPD", changes))
+        start = time.perf_counter()
+        player.connection.settimeout(self.timeout)
+        try:
+            move = player.read_move()
+        except socket.timeout:
+            player.timeouts += 1
+            return False
+        except ConnectionError:
+            return False
+        finally:
+            player.connection.settimeout(None)
+        player.latencies.append(time.perf_counter() - start)
+        if not self.is_legal_move(game_state, move):
+            player.illegal_moves += 1
+            return False
+        outcomes = game_state.get_move_outcomes(move)
+        _, changes = self.random.choices(outcomes, weights=[proba for proba, _ in outcomes])[0]
+        game_state.do_move(changes)
+        for other_player in self.players:
+            for x, y, *content in changes:
+                other_player.pending_changes[(x, y)] = content
+        return True
+
+    def play(self):
+        """Play a game between the two connected players and return its result"""
+        size, start, cells = self.game_map
+        game_state = GameState()
+        game_state.update_game_state(["set", list(size)])
+        game_state.update_game_state(["hme", list(start)])
+        game_state.update_game_state(["map", cells])
+        self._send_map()
+
+        winner = None
+        turn = 0
+        while turn < self.max_turns:
+            player = self.players[turn % 2]
+            if not self._play_turn(game_state, player):
+                winner = 3 - player.team
+                break
+            turn += 1
+            # the state is seen by the player to move, a battle can also be lost by the player who moved
+            if not game_state.TEAM_POSITIONS or not game_state.ENEMY_POSITIONS:
+                if game_state.TEAM_POSITIONS or game_state.ENEMY_POSITIONS:
+                    winner = game_state.TEAM if game_state.TEAM_POSITIONS else game_state.ENEMY_TEAM
+                break
+        else:
+            if game_state.UNITS[1] != game_state.UNITS[2]:
+                winner = 1 if game_state.UNITS[1] > game_state.UNITS[2] else 2
+
+        for player in self.players:
+            try:
+                player.send(b"END")
+                player.send(b"BYE")
+            except OSError:
+                pass
+        return {
+            "winner": winner,
+            "turns": turn,
+            "units": game_state.UNITS[1:],
+            "names": [player.name for player in self.players],
+            "latencies": [player.latencies for player in self.players],
+            "timeouts": [player.timeouts for player in self.players],
+            "illegal_moves": [player.illegal_moves for player in self.players],
+        }
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--port', default=config.SERVER_PORT, type=int, help='Port the players connect to.')
+    parser.add_argument('--size', default=[10, 10], type=int, nargs=2, help='Rows and columns of the random map.')
+    parser.add_argument('--seed', default=0, type=int, help='Seed of the random map and of the battles.')
+    parser.add_argument('--timeout', default=config.MOVE_TIMEOUT, type=float, help='Time allowed for each move, in seconds.')
+    parser.add_argument('--max-turns', default=MAX_TURNS, type=int, help='Moves played before the team with the most units is declared the winner.')
+    args = parser.parse_args()
+
+    server = LocalServer(random_map(*args.size, args.seed), args.port, args.timeout, args.max_turns, args.seed)
+    print(f"waiting for 2 players on port {server.port}")
+    try:
+        for _ in range(2):
+            player = server.accept_player()
+            print(f"{player.name} plays team {player.team}")
+        result = server.play()
+    finally:
+        server.close()
+    print(result)
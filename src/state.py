@@ -1,55 +1,146 @@
+import heapq
+
 import numpy as np
-from scipy.special import binom
+
+from battle import human_battle_outcomes, enemy_battle_outcomes
+
+ZOBRIST_MASK = (1 << 64) - 1
+_zobrist_keys = {}
+
+
+def _splitmix64(x):
+    x = (x + 0x9E3779B97F4A7C15) & ZOBRIST_MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & ZOBRIST_MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & ZOBRIST_MASK
+    return x ^ (x >> 31)
+
+
+def zobrist_key(i,j,channel,count):
+    """Random 64 bits key for `count` units of type `channel` on the cell (i,j), an empty cell has key 0"""
+    if count == 0:
+        return 0
+    index = (int(i) << 40) | (int(j) << 24) | (channel << 20) | int(count)
+    key = _zobrist_keys.get(index)
+    if key is None:
+        key = _zobrist_keys[index] = _splitmix64(index)
+    return key
+
+# Xored in the hash each time the player to move changes
+ZOBRIST_SIDE_KEY = _splitmix64(1 << 63)
+
+# Order in which get_possible_directions gives the directions
+DIRECTIONS = ((1,1),(1,-1),(1,0),(-1,0),(-1,1),(-1,-1),(0,-1),(0,1))
+
 
 class GameState:
 
     def __init__(self):
         self.STATE = None
+        # Bounds (m,n) of the cells (i,j) of the board, the size of the SET message reversed
+        self.SIZE = None
+        self.SAT = None
+        self.SAT_PENDING = {}
         self.TEAM = None
         self.ENEMY_TEAM = None
         self.START = None
         self.TEAM_POSITIONS = set()
         self.ENEMY_POSITIONS = set()
         self.HUMAN_POSITIONS = set()
+        # Total number of humans, team 1 and team 2 units on the board
+        self.UNITS = [0,0,0]
+        self.HASH = 0
         
     
     def copy(self):
-        copy = GameState()
-        copy.STATE = np.copy(self.STATE)
+        copy = self.__class__()
+        self._copy_board(copy)
+        copy.SIZE = self.SIZE
         copy.TEAM = self.TEAM
         copy.ENEMY_TEAM = self.ENEMY_TEAM
         copy.START = self.START
         copy.TEAM_POSITIONS = self.TEAM_POSITIONS.copy()
         copy.ENEMY_POSITIONS = self.ENEMY_POSITIONS.copy()
         copy.HUMAN_POSITIONS = self.HUMAN_POSITIONS.copy()
+        copy.UNITS = self.UNITS.copy()
+        copy.HASH = self.HASH
         return copy
 
     def change_teams(self):
         self.TEAM,self.ENEMY_TEAM = self.ENEMY_TEAM,self.TEAM
         self.TEAM_POSITIONS,self.ENEMY_POSITIONS = self.ENEMY_POSITIONS,self.TEAM_POSITIONS
+        self.HASH ^= ZOBRIST_SIDE_KEY
 
     def set_board(self,size):
         n,m = size
-        self.STATE = np.array([[[0,0,0]]*n]*m)
+        self.SIZE = (m,n)
+        self.STATE = np.zeros((m,n,3),dtype=np.int64)
+        # Summed-area table: SAT[c,a,b] is the number of units of type c in STATE[:a,:b]
+        self.SAT = np.zeros((3,m+1,n+1),dtype=self.STATE.dtype)
+
+    def _copy_board(self,copy):
+        copy.STATE = np.copy(self.STATE)
+        copy.SAT = np.copy(self.SAT)
+        copy.SAT_PENDING = self.SAT_PENDING.copy()
+
+    def get_cell(self,i,j):
+        """[humans,team1,team2] on the cell (i,j)"""
+        return self.STATE[i,j].tolist()
+
+    def get_units(self,i,j,channel):
+        return int(self.STATE[i,j,channel])
+
+    def get_units_array(self,positions,channel):
+        """Units of type channel on the cells of a (n,2) array of positions"""
+        return self.STATE[positions[:,0],positions[:,1],channel]
+
+    def _set_cell(self,i,j,people,previous):
+        for channel in range(3):
+            if people[channel] != previous[channel]:
+                key = (channel,i,j)
+                self.SAT_PENDING[key] = self.SAT_PENDING.get(key,0) + people[channel] - previous[channel]
+        self.STATE[i,j,:] = people
 
     def update_board(self,changes):
+        # The client decodes the MAP and UPD messages into an array of (i,j,humans,team1,team2)
+        if isinstance(changes,np.ndarray):
+            changes = changes.tolist()
         for i,j,a,b,c in changes:
             people = [a,b,c]
+            previous = self.get_cell(i,j)
+            if people == previous:
+                continue
 
             #Update the teams positions
-            if people[self.TEAM] > 0 and self.STATE[i,j,self.TEAM] == 0:
+            if people[self.TEAM] > 0 and previous[self.TEAM] == 0:
                 self.TEAM_POSITIONS.add((i,j))
-            if people[self.TEAM] == 0 and self.STATE[i,j,self.TEAM] > 0:
+            if people[self.TEAM] == 0 and previous[self.TEAM] > 0:
                 self.TEAM_POSITIONS.remove((i,j))
-            if people[self.ENEMY_TEAM] > 0 and self.STATE[i,j,self.ENEMY_TEAM] == 0:
+            if people[self.ENEMY_TEAM] > 0 and previous[self.ENEMY_TEAM] == 0:
                 self.ENEMY_POSITIONS.add((i,j))
-            if people[self.ENEMY_TEAM] == 0 and self.STATE[i,j,self.ENEMY_TEAM] > 0:
+            if people[self.ENEMY_TEAM] == 0 and previous[self.ENEMY_TEAM] > 0:
                 self.ENEMY_POSITIONS.remove((i,j))
-            if people[0] > 0 and self.STATE[i,j,0] == 0:
+            if people[0] > 0 and previous[0] == 0:
                 self.HUMAN_POSITIONS.add((i,j))
-            if people[0] == 0 and self.STATE[i,j,0] > 0:
+            if people[0] == 0 and previous[0] > 0:
                 self.HUMAN_POSITIONS.remove((i,j))
-            self.STATE[i,j,:] = people
+
+            #Update the Zobrist hash and the unit totals
+            for channel in range(3):
+                if people[channel] != previous[channel]:
+                    self.UNITS[channel] += people[channel] - previous[channel]
+                    self.HASH ^= zobrist_key(i,j,channel,previous[channel]) ^ zobrist_key(i,j,channel,people[channel])
+            self._set_cell(i,j,people,previous)
+
+    def update_summed_area_table(self):
+        """Add the changes recorded by update_board to the summed-area table.
+
+        The changes are only applied when the table is queried, so that the changes of a move
+        and of its undo cancel out without touching the table.
+        """
+        for (channel,i,j),delta in self.SAT_PENDING.items():
+            if delta != 0:
+                self.SAT[channel,i+1:,j+1:] += delta
+        self.SAT_PENDING.clear()
 
 
     def update_start_position(self,start):
@@ -59,6 +150,8 @@ class GameState:
     def init_board(self,changes):
         # At the start we need to get which team we are in with the start position
         i,j = self.START
+        if isinstance(changes,np.ndarray):
+            changes = changes.tolist()
         for i2,j2,_,b,c in changes:
             if i == i2 and j == j2 and b > 1:
                 self.TEAM = 1
@@ -83,121 +176,175 @@ class GameState:
             message_handler[info_type](data)
 
     def get_possible_directions(self,i,j):
-        directions = []
-        if np.sum(self.STATE[i+1:,j+1:,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i+1:,j+1:,0]) > np.sum(self.STATE[i+1:,j+1:,self.TEAM]):
-            directions.append((i+1,j+1))
-        if j>0 and (np.sum(self.STATE[i+1:,:j,self.ENEMY_TEAM]) >0 or np.sum(self.STATE[i+1:,:j,0]) > np.sum(self.STATE[i+1:,:j,self.TEAM])):
-            directions.append((i+1,j-1))
-        if np.sum(self.STATE[i+1:,j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i+1:,j,0]) > np.sum(self.STATE[i+1:,j,self.TEAM]):
-            directions.append((i+1,j))
-        if i>0 and (np.sum(self.STATE[:i,j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[:i,j,0]) > np.sum(self.STATE[:i,j,self.TEAM])):
-            directions.append((i-1,j))
-        if i>0 and (np.sum(self.STATE[:i,j+1:,self.ENEMY_TEAM])>0 or np.sum(self.STATE[:i,j+1:,0]) > np.sum(self.STATE[:i,j+1:,self.TEAM])):
-            directions.append((i-1,j+1))
-        if i>0 and j>0 and (np.sum(self.STATE[:i,:j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[:i,:j,0]) > np.sum(self.STATE[:i,:j,self.TEAM])):
-            directions.append((i-1,j-1))
-        if j>0 and (np.sum(self.STATE[i,:j,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i,:j,0])> np.sum(self.STATE[i,:j,self.TEAM])):
-            directions.append((i,j-1))
-        if (np.sum(self.STATE[i,j+1:,self.ENEMY_TEAM])>0 or np.sum(self.STATE[i,j+1:,0]) > np.sum(self.STATE[i,j+1:,self.TEAM])):
-            directions.append((i,j+1))
-        return directions
+        """Directions from (i,j) leading towards enemies or towards more humans than team units.
+
+        The 8 regions of the board seen from (i,j) are summed at once with the summed-area table.
+        """
+        if self.SAT_PENDING:
+            self.update_summed_area_table()
+        sat = self.SAT
+        m,n = self.SIZE
+        # rows [r0,r1) x columns [c0,c1) of each direction region
+        r0 = (i+1,i+1,i+1,0,0,0,i,i)
+        r1 = (m,m,m,i,i,i,i+1,i+1)
+        c0 = (j+1,0,j,j,j+1,0,0,j+1)
+        c1 = (n,j,j+1,j+1,n,j,j,n)
+        sums = sat[:,r1,c1] - sat[:,r0,c1] - sat[:,r1,c0] + sat[:,r0,c0]
+        allowed = (sums[self.ENEMY_TEAM] > 0) | (sums[0] > sums[self.TEAM])
+        return [(i+di,j+dj) for (di,dj),ok in zip(DIRECTIONS,allowed) if ok]
 
     def check_move_is_allowed(self,move):
         starts,_,ends = zip(*move)
         return len(set(starts).intersection(set(ends))) == 0
 
     
-    def get_next_moves(self,with_split=False):
-        """only consider restrained list of moves"""
-        all_moves = set()
+    def get_next_moves(self,with_split=False,priority=None):
+        """only consider restrained list of moves
 
+        Moves are generated lazily, from the highest to the lowest sum of priority(source, n_units, destination)
+        over their sub-moves when a priority is given. Each move is generated once.
+        """
+        groups = []
         for i,j in self.TEAM_POSITIONS:
-            units = self.STATE[i,j,self.TEAM]
-            new_moves = set([frozenset({((i,j),units,(k,l))}) for k,l in  self.get_possible_directions(i,j)])
-            combination_moves = [ move.union(new_move) for move in all_moves for new_move in new_moves]
-            combination_moves = set([m for m in combination_moves if self.check_move_is_allowed(m)])
-            all_moves.update(new_moves)
-            all_moves.update(combination_moves)
+            units = self.get_units(i,j,self.TEAM)
+            options = [(0,None)] + [
+                (priority((i,j),units,(k,l)) if priority else 0,((i,j),units,(k,l)))
+                for k,l in self.get_possible_directions(i,j)
+            ]
+            # staying is the least preferred option of a group with the same priority
+            options.sort(key=lambda option:(option[0],option[1] is not None),reverse=True)
+            groups.append(options)
 
+        moves = self._best_first_moves(groups)
         if with_split and len(self.TEAM_POSITIONS)<2:
-            all_moves.update(self.get_next_moves_with_one_split())
-        return all_moves
+            split_moves = sorted(
+                ((sum(priority(*sub_move) for sub_move in move) if priority else 0,move) for move in self.get_next_moves_with_one_split()),
+                key=lambda scored_move:scored_move[0],
+                reverse=True
+            )
+            moves = heapq.merge(moves,split_moves,key=lambda scored_move:scored_move[0],reverse=True)
+        for _,move in moves:
+            yield move
+
+    def _best_first_moves(self,groups):
+        """Allowed combinations of one option per group as (priority, move), from the highest to the lowest priority.
+
+        The options of each group are sorted by decreasing priority, a combination is the vector of the chosen
+        option indices. The successors of a combination only increase the indices from the last one increased,
+        so every combination has a single predecessor and is pushed on the heap once.
+        """
+        if not groups:
+            return
+        first = tuple(0 for _ in groups)
+        heap = [(-sum(options[0][0] for options in groups),first,0)]
+        while heap:
+            neg_priority,indices,last = heapq.heappop(heap)
+            move = frozenset(groups[g][index][1] for g,index in enumerate(indices) if groups[g][index][1] is not None)
+            if move and self.check_move_is_allowed(move):
+                yield -neg_priority,move
+            for g in range(last,len(groups)):
+                index = indices[g]
+                if index+1 < len(groups[g]):
+                    successor = indices[:g] + (index+1,) + indices[g+1:]
+                    successor_priority = neg_priority + groups[g][index][0] - groups[g][index+1][0]
+                    heapq.heappush(heap,(successor_priority,successor,g))
 
     def get_next_moves_with_one_split(self,max_split_interval=2):
-        all_moves = set()
         for i,j in self.TEAM_POSITIONS:
-            units = self.STATE[i,j,self.TEAM]
+            units = self.get_units(i,j,self.TEAM)
             split_interval = min(max_split_interval,units//2)
             if split_interval>0:
-                for nb in map(int,np.linspace(units//2//split_interval,units//2,split_interval)): #only consider 3 possible split sizes
-                    for k,l in self.get_possible_directions(i,j):
-                        for k2,l2 in self.get_possible_directions(i,j):
-                            if k!=k2 or l!=l2:
-                                all_moves.add(frozenset({((i,j),nb,(k,l)),((i,j),units-nb,(k2,l2))}))
-        return all_moves
-    
+                directions = self.get_possible_directions(i,j)
+                for nb in sorted(set(map(int,np.linspace(units//2//split_interval,units//2,split_interval)))): #only consider 3 possible split sizes
+                    for k,l in directions:
+                        for k2,l2 in directions:
+                            # halves are generated once
+                            if (k,l) < (k2,l2) or ((k,l) != (k2,l2) and 2*nb != units):
+                                yield frozenset({((i,j),nb,(k,l)),((i,j),units-nb,(k2,l2))})
 
-    def get_possible_moves(
-            self,
-            min_group_size=1,
-            max_number_group=None,
-            team_positions=None,
-            current_move={},
-            current_move_dests=set(),
-            current_move_sources=set()
-        ):
-        if team_positions is None:
-            team_positions = { (i,j):self.STATE[i,j,self.TEAM] for i,j in self.TEAM_POSITIONS}
-        all_moves = set()
-        for i,j in team_positions:
-            units = team_positions[(i,j)]
-            if (i,j) not in current_move_dests:
-                possible_nb_units = [units]
-                if max_number_group is not None or len(self.TEAM_POSITIONS) + len(current_move) < max_number_group:
-                    possible_nb_units = possible_nb_units + list(range(min_group_size,units+1-min_group_size))
-                for nb in possible_nb_units:
-                    for k,l in self.get_possible_directions(i,j):
-                        if (i,j,k,l) in current_move or (k,l) in current_move_sources:
-                            continue
-                        new_current = current_move.copy()
-                        new_current[(i,j,k,l)] = nb
-                        frozen_current = frozenset({((i,j),nb,(k,l)) for (i,j,k,l),nb in new_current.items()})
-                        if frozen_current in all_moves:
-                            continue
-                        all_moves.add(frozen_current)
-                        new_current_move_dests = current_move_dests.copy()
-                        new_current_move_dests.add((k,l))
-                        new_current_move_sources = current_move_sources.copy()
-                        new_current_move_sources.add((i,j))
-                        remaining_team_positions = team_positions.copy()
-                        remaining_team_positions[(i,j)] = remaining_team_positions[(i,j)] - nb
-                        if remaining_team_positions[(i,j)] == 0:
-                            del remaining_team_positions[(i,j)]
-                        recurrent_moves = self.get_possible_moves(
-                            min_group_size,
-                            max_number_group,
-                            remaining_team_positions,
-                            new_current,
-                            new_current_move_dests,
-                            new_current_move_sources)
-                        all_moves = all_moves.union(recurrent_moves)
-        return all_moves
+    def is_next_move(self,move,with_split=False):
+        """Whether move can be generated by get_next_moves"""
+        if not move or not self.check_move_is_allowed(move):
+            return False
+        sub_moves = {}
+        for source,n_units,destination in move:
+            sub_moves.setdefault(source,[]).append((n_units,destination))
+        for (i,j),group_moves in sub_moves.items():
+            if (i,j) not in self.TEAM_POSITIONS:
+                return False
+            directions = self.get_possible_directions(i,j)
+            if any(destination not in directions for _,destination in group_moves):
+                return False
+            units = self.get_units(i,j,self.TEAM)
+            if len(group_moves) == 1:
+                if group_moves[0][0] != units:
+                    return False
+            elif not (with_split and len(self.TEAM_POSITIONS)<2 and move in self.get_next_moves_with_one_split()):
+                return False
+        return True
 
-    def apply_move(self,moves):
-        states = [(1,self.copy())]
+    def get_possible_moves(self,min_group_size=1,max_number_group=None,priority=None):
+        """All the moves where groups can be split in groups of at least min_group_size units.
+
+        Groups are only split while the team has at most max_number_group groups after the move, each
+        sub-move leaving units behind on its source adding a group whatever its place in the move.
+        Moves are generated lazily, each one once: the sub-moves of a move are taken in the order of a
+        list of (source, destination) candidates, sorted by decreasing priority(source, n_units, destination)
+        of the whole group when a priority is given.
+        """
+        units = {(i,j):self.get_units(i,j,self.TEAM) for i,j in self.TEAM_POSITIONS}
+        candidates = [((i,j),(k,l)) for i,j in self.TEAM_POSITIONS for k,l in self.get_possible_directions(i,j)]
+        if priority:
+            candidates.sort(key=lambda candidate:priority(candidate[0],units[candidate[0]],candidate[1]),reverse=True)
+        max_splits = None if max_number_group is None else max_number_group - len(self.TEAM_POSITIONS)
+        yield from self._extend_possible_moves(candidates,0,(),0,units,set(),set(),min_group_size,max_splits)
+
+    def _extend_possible_moves(self,candidates,start,current_move,nb_splits,remaining_units,sources,destinations,min_group_size,max_splits):
+        for index in range(start,len(candidates)):
+            source,destination = candidates[index]
+            remaining = remaining_units.get(source,0)
+            if remaining == 0 or source in destinations or destination in sources:
+                continue
+            possible_nb_units = [remaining]
+            if max_splits is None or nb_splits < max_splits:
+                possible_nb_units += range(min_group_size,remaining+1-min_group_size)
+            new_source = source not in sources
+            new_destination = destination not in destinations
+            sources.add(source)
+            destinations.add(destination)
+            for nb in possible_nb_units:
+                new_current_move = current_move + ((source,nb,destination),)
+                yield frozenset(new_current_move)
+                remaining_units[source] = remaining - nb
+                yield from self._extend_possible_moves(
+                    candidates,index+1,new_current_move,nb_splits+(nb<remaining),remaining_units,sources,destinations,min_group_size,max_splits)
+            remaining_units[source] = remaining
+            if new_destination:
+                destinations.remove(destination)
+            if new_source:
+                sources.remove(source)
+
+    def get_move_outcomes(self,moves):
+        """Possible results of the moves as a list of (probability, changes), one for each different board.
+
+        The changes are the new contents (i,j,humans,team1,team2) of the cells modified by the moves,
+        they can be applied in place with do_move.
+        """
+        outcomes = [(1,{})]
         for (x_start, y_start), n_units, (x_end, y_end) in moves:
-            for _,state in states:
-                new_start = list(state.STATE[x_start, y_start,:])
-                new_start[state.TEAM] -= n_units
-                state.update_board([(x_start, y_start,*new_start)])
-            
-            destination_content = self.STATE[x_end, y_end,:]
+            for _,cells in outcomes:
+                new_start = cells.get((x_start, y_start)) or self.get_cell(x_start, y_start)
+                new_start = list(new_start)
+                new_start[self.TEAM] -= n_units
+                cells[(x_start, y_start)] = new_start
+
+            destination_content = self.get_cell(x_end, y_end)
             #No conflict
-            if np.sum(destination_content) == 0 or destination_content[self.TEAM] > 0:
-                for _,state in states:
-                    new_content = [0,0,0]
-                    new_content[state.TEAM] += n_units+destination_content[self.TEAM]
-                    state.update_board([(x_end, y_end,*new_content)])
+            if sum(destination_content) == 0 or destination_content[self.TEAM] > 0:
+                new_content = [0,0,0]
+                new_content[self.TEAM] += n_units+destination_content[self.TEAM]
+                for _,cells in outcomes:
+                    cells[(x_end, y_end)] = new_content
                 continue
             
             # If there are humans
@@ -206,32 +353,25 @@ class GameState:
 
                 # No battle
                 if n_units >= n_humans:
-                    for _,state in states:
-                        new_content = [0,0,0]
-                        new_content[state.TEAM] += n_units + destination_content[0]
-                        state.update_board([(x_end, y_end,*new_content)])
+                    new_content = [0,0,0]
+                    new_content[self.TEAM] += n_units + destination_content[0]
+                    for _,cells in outcomes:
+                        cells[(x_end, y_end)] = new_content
                 
                 # Battle
                 elif n_units >= n_humans*1.5:
-                    p_win = n_units / (2 * n_humans)
-                    n = n_units + n_humans
-                    n_surv_with_proba = [(p_win*binom(n,k)*p_win**k*(1-p_win)**(n-k),k) for k in range(n+1)]
-                    n_surv_human_with_proba = [((1-p_win)*binom(n_humans,k)*(1-p_win)**k*p_win**(n_humans-k),k) for k in range(n_humans+1)]
-                    new_states = []
-                    for proba1,state in states:
+                    n_surv_with_proba,n_surv_human_with_proba = human_battle_outcomes(n_units,n_humans)
+                    new_outcomes = []
+                    for proba1,cells in outcomes:
                         #case team win
                         for proba2,n_surv in n_surv_with_proba:
                             new_content = [0,0,0]
-                            new_content[state.TEAM] = n_surv
-                            state = state.copy()
-                            state.update_board([(x_end, y_end,*new_content)])
-                            new_states.append((proba1*proba2,state))
+                            new_content[self.TEAM] = n_surv
+                            new_outcomes.append((proba1*proba2,{**cells,(x_end, y_end):new_content}))
                         #case human win
                         for proba2,n_surv in n_surv_human_with_proba:
-                            state = state.copy()
-                            state.update_board([(x_end, y_end,n_surv,0,0)])
-                            new_states.append((proba1*proba2,state))
-                    states = new_states
+                            new_outcomes.append((proba1*proba2,{**cells,(x_end, y_end):[n_surv,0,0]}))
+                    outcomes = new_outcomes
                 continue
 
             # If there are enemies
@@ -241,41 +381,111 @@ class GameState:
                 if n_units >= 1.5 * n_ennemies:
                     new_content = [0,0,0]
                     new_content[self.TEAM]=n_units
-                    for _,state in states:
-                        state.update_board([(x_end, y_end,*new_content)])
+                    for _,cells in outcomes:
+                        cells[(x_end, y_end)] = new_content
                     continue
                 if 1.5 * n_units <=  n_ennemies:
                     continue
                 
                 # Battle
-                if n_units <= n_ennemies:
-                    p_win = n_units / (2 * n_ennemies)
-                else:
-                    p_win = (n_units / n_ennemies) - 0.5
+                n_surv_team_with_proba,n_surv_ennemy_with_proba = enemy_battle_outcomes(n_units,n_ennemies)
                 
-                n_surv_team_with_proba = [(p_win*binom(n_units,k)*(1-p_win)**k*p_win**(n_units-k),k) for k in range(n_units+1)]
-                n_surv_ennemy_with_proba = [((1-p_win)*binom(n_ennemies,k)*(1-p_win)**k*p_win**(n_ennemies-k),k) for k in range(n_ennemies+1)]
-                
-                new_states = []
-                for proba1,state in states:
+                new_outcomes = []
+                for proba1,cells in outcomes:
                     #case team win
                     for proba2,n_surv in n_surv_team_with_proba:
                         new_content = [0,0,0]
-                        new_content[state.TEAM] = n_surv
-                        state = state.copy()
-                        state.update_board([(x_end, y_end,*new_content)])
-                        new_states.append((proba1*proba2,state))
+                        new_content[self.TEAM] = n_surv
+                        new_outcomes.append((proba1*proba2,{**cells,(x_end, y_end):new_content}))
                     #case ennemy win
                     for proba2,n_surv in n_surv_ennemy_with_proba:
                         new_content = [0,0,0]
                         new_content[self.ENEMY_TEAM] = n_surv
-                        state = state.copy()
-                        state.update_board([(x_end, y_end,*new_content)])
-                        new_states.append((proba1*proba2,state))
-                states = new_states
-
-        #Change the player after the move has been done        
-        for _,state in states:
-            state.change_teams()
+                        new_outcomes.append((proba1*proba2,{**cells,(x_end, y_end):new_content}))
+                outcomes = new_outcomes
+
+        # Outcomes leading to the same board, like battles without survivors, are merged
+        merged_outcomes = {}
+        for proba,cells in outcomes:
+            key = tuple((cell,tuple(content)) for cell,content in sorted(cells.items()))
+            if key in merged_outcomes:
+                merged_outcomes[key][0] += proba
+            else:
+                merged_outcomes[key] = [proba,cells]
+        return [(proba,[(i,j,*content) for (i,j),content in cells.items()]) for proba,cells in merged_outcomes.values()]
+
+    def do_move(self,changes):
+        """Apply the changes of one outcome of a move in place and give the turn to the other player.
+
+        Returns the undo log to pass to undo_move.
+        """
+        undo_log = [(i,j,*self.get_cell(i,j)) for i,j,*_ in changes]
+        self.update_board(changes)
+        self.change_teams()
+        return undo_log
+
+    def undo_move(self,undo_log):
+        self.change_teams()
+        self.update_board(undo_log)
+
+    def apply_move(self,moves):
+        states = []
+        for proba,changes in self.get_move_outcomes(moves):
+            state = self.copy()
+            state.do_move(changes)
+            states.append((proba,state))
         return states
 
+
+class SparseGameState(GameState):
+    """GameState keeping only the occupied cells, for the large and mostly empty maps.
+
+    The board is a {(i,j): units} dict for each type of units instead of the STATE array, so that its
+    memory and copy cost grow with the number of groups instead of the area of the map. The directions
+    are found by summing the groups of each region instead of with a summed-area table.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # GROUPS[c] has the units of type c (humans, team 1, team 2) of each occupied cell
+        self.GROUPS = ({},{},{})
+
+    def set_board(self,size):
+        n,m = size
+        self.SIZE = (m,n)
+
+    def _copy_board(self,copy):
+        copy.GROUPS = tuple(groups.copy() for groups in self.GROUPS)
+
+    def get_cell(self,i,j):
+        return [groups.get((i,j),0) for groups in self.GROUPS]
+
+    def get_units(self,i,j,channel):
+        return self.GROUPS[channel].get((i,j),0)
+
+    def get_units_array(self,positions,channel):
+        groups = self.GROUPS[channel]
+        return np.array([groups.get((i,j),0) for i,j in positions.tolist()],dtype=np.int64)
+
+    def _set_cell(self,i,j,people,previous):
+        for groups,units in zip(self.GROUPS,people):
+            if units > 0:
+                groups[(i,j)] = units
+            else:
+                groups.pop((i,j),None)
+
+    def get_possible_directions(self,i,j):
+        """Directions from (i,j) leading towards enemies or towards more humans than team units.
+
+        The groups are summed by region, the region of a cell being the signs of its offsets from (i,j).
+        """
+        sums = {}
+        for channel,groups in enumerate(self.GROUPS):
+            for (k,l),units in groups.items():
+                region = ((k>i)-(k<i),(l>j)-(l<j))
+                if region != (0,0):
+                    sums.setdefault(region,[0,0,0])[channel] += units
+        return [
+            (i+di,j+dj) for di,dj in DIRECTIONS
+            if (di,dj) in sums and (sums[di,dj][self.ENEMY_TEAM] > 0 or sums[di,dj][0] > sums[di,dj][self.TEAM])
+        ]
@@ -0,0 +1,99 @@
+"""Games between engine configurations on the local server, played in parallel.
+
+An engine is given by the options passed to main.py, each pair of engines plays the same random maps
+with both colors. The win rate, the move latency and the timeouts of each engine are reported.
+
+Run from the src directory, for example:
+python tournament.py --engine "--ai-mode alpha_beta" --engine "--ai-mode alpha_beta --ponder" --games 10
+"""
+import os
+import shlex
+import subprocess
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import config
+from server import LocalServer, random_map, MAX_TURNS
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def play_match(engines, size, seed, timeout, max_turns):
+    """Play a game of engines[0] (vampires) against engines[1] (werewolves) and return the server result"""
+    server = LocalServer(random_map(*size, seed), timeout=timeout, max_turns=max_turns, seed=seed)
+    clients = []
+    try:
+        # the players are started one after the other so that the first engine gets the first team
+        for engine in engines:
+            command = [sys.executable, "main.py", "127.0.0.1", str(server.port), "--timeout", str(timeout), *shlex.split(engine)]
+            clients.append(subprocess.Popen(command, cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            server.accept_player()
+        return server.play()
+    finally:
+        server.close()
+        for client in clients:
+            try:
+                client.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                client.kill()
+
+
+def summarize(engines, games):
+    """Results of each engine over the games, as a list of dicts"""
+    summary = {engine: {"games": 0, "wins": 0, "draws": 0, "latencies": [], "timeouts": 0, "illegal_moves": 0} for engine in engines}
+    for players, result in games:
+        for team, engine in enumerate(players, 1):
+            stats = summary[engine]
+            stats["games"] += 1
+            stats["wins"] += result["winner"] == team
+            stats["draws"] += result["winner"] is None
+            stats["latencies"] += result["latencies"][team-1]
+            stats["timeouts"] += result["timeouts"][team-1]
+            stats["illegal_moves"] += result["illegal_moves"][team-1]
+    return [
+        {
+            "engine": engine,
+            "games": stats["games"],
+            "win_rate": stats["wins"]/stats["games"] if stats["games"] else 0,
+            "draws": stats["draws"],
+            "mean_latency": sum(stats["latencies"])/len(stats["latencies"]) if stats["latencies"] else 0,
+            "max_latency": max(stats["latencies"], default=0),
+            "timeouts": stats["timeouts"],
+            "illegal_moves": stats["illegal_moves"],
+        }
+        for engine, stats in summary.items()
+    ]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--engine', dest='engines', action='append', required=True, help='Options of main.py defining an engine, repeat for each engine.')
+    parser.add_argument('--games', default=4, type=int, help='Maps played by each pair of engines, each with both colors.')
+    parser.add_argument('--size', default=[10, 10], type=int, nargs=2, help='Rows and columns of the random maps.')
+    parser.add_argument('--timeout', default=config.MOVE_TIMEOUT, type=float, help='Time allowed for each move, in seconds.')
+    parser.add_argument('--max-turns', default=MAX_TURNS, type=int, help='Moves played before the team with the most units is declared the winner.')
+    parser.add_argument('--workers', default=max(1, os.cpu_count()//2), type=int, help='Games played at the same time, each game runs two engines.')
+    args = parser.parse_args()
+
+    engines = list(dict.fromkeys(args.engines))
+    pairs = list(combinations(engines, 2)) if len(engines) > 1 else [(engines[0], engines[0])]
+    matches = [
+        (players, seed)
+        for pair in pairs
+        for seed in range(args.games)
+        for players in (pair, pair[::-1])
+    ]
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(play_match, players, tuple(args.size), seed, args.timeout, args.max_turns) for players, seed in matches]
+        games = [(players, future.result()) for (players, _), future in zip(matches, futures)]
+
+    for stats in summarize(engines, games):
+        print(f"{stats['engine']!r}: {stats['games']} games, win rate {100*stats['win_rate']:.0f}% ({stats['draws']} draws), "
+              f"move latency {1000*stats['mean_latency']:.0f}ms mean {1000*stats['max_latency']:.0f}ms max, "
+              f"{stats['timeouts']} timeouts, {stats['illegal_moves']} illegal moves")
+
+
+if __name__ == '__main__':
+    main()